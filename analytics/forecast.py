@@ -0,0 +1,152 @@
+"""
+Trend projections of the record totals
+"""
+import threading
+import numpy as np
+from analytics.metrics import month_end_values
+
+class TrendForecaster:
+    """Fit trends to total and total_with_fgts and project them forward
+    
+    Methods:
+    - 'linear': least-squares line over every record
+    - 'exponential': least-squares line over the log of the totals (constant growth rate)
+    - 'holt_winters': additive Holt-Winters smoothing of month-end balances,
+      with a yearly season once there are two years of history (Holt's linear
+      trend before that)
+    
+    Fitted parameters are cached under the last record date. The database
+    generation is part of the key too, so editing an older record also refits,
+    while switching tabs with unchanged data does not.
+    """
+    
+    SERIES = ('total', 'total_with_fgts')
+    METHODS = ('linear', 'exponential', 'holt_winters')
+    
+    # Smoothing factors of the level, trend and season
+    HOLT_WINTERS_ALPHA = 0.5
+    HOLT_WINTERS_BETA = 0.1
+    HOLT_WINTERS_GAMMA = 0.3
+    SEASON_MONTHS = 12
+    
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+        self._lock = threading.Lock()
+        self._fits = {}
+        self._fits_key = None
+    
+    def forecast(self, method: str = 'linear', months: int = 12):
+        """Project both totals month by month, or None without enough history
+        
+        Returns the history (dates, totals, totals_with_fgts) with the projected
+        month starts ('forecast_dates') and values ('forecast', by series name).
+        """
+        if method not in self.METHODS:
+            raise ValueError(f"Unknown forecast method '{method}'")
+        
+        columns = self.db_manager.get_summary_columns()
+        if len(columns['date_key']) < 2:
+            return None
+        
+        dates = np.array(columns['date_key'], dtype='datetime64[D]')
+        history = np.array([columns[name] for name in self.SERIES], dtype=np.float64)
+        params = self.fitted_params(method, columns['date_key'][-1], dates, history)
+        
+        last_month = dates[-1].astype('datetime64[M]')
+        forecast_dates = (last_month + np.arange(1, months + 1)).astype('datetime64[D]')
+        projected = getattr(self, f'_project_{method}')(params, dates, forecast_dates)
+        return {
+            'method': method,
+            'dates': dates,
+            'totals': history[0],
+            'totals_with_fgts': history[1],
+            'forecast_dates': forecast_dates,
+            'forecast': dict(zip(self.SERIES, projected)),
+        }
+    
+    def fitted_params(self, method, last_date_key, dates, history):
+        """Parameters of a method's fit, reused while the data is unchanged"""
+        key = (last_date_key, self.db_manager.generation)
+        with self._lock:
+            if key != self._fits_key:
+                self._fits = {}
+                self._fits_key = key
+            if method not in self._fits:
+                self._fits[method] = getattr(self, f'_fit_{method}')(dates, history)
+            return self._fits[method]
+    
+    @staticmethod
+    def _days(dates, origin):
+        return (dates - origin).astype('timedelta64[D]').astype(np.float64)
+    
+    def _fit_linear(self, dates, history):
+        """Slope and intercept of each series against days since the first record"""
+        t = self._days(dates, dates[0])
+        design = np.column_stack((t, np.ones_like(t)))
+        coefficients = np.linalg.lstsq(design, history.T, rcond=None)[0]
+        return {'origin': dates[0], 'coefficients': coefficients}
+    
+    def _project_linear(self, params, dates, forecast_dates):
+        t = self._days(forecast_dates, params['origin'])
+        slope, intercept = params['coefficients']
+        return slope[:, None] * t + intercept[:, None]
+    
+    def _fit_exponential(self, dates, history):
+        """Log-linear fit per series; only positive totals take part"""
+        t = self._days(dates, dates[0])
+        coefficients = np.full((2, len(history)), np.nan)
+        for i, series in enumerate(history):
+            positive = series > 0
+            if positive.sum() >= 2:
+                design = np.column_stack((t[positive], np.ones(positive.sum())))
+                coefficients[:, i] = np.linalg.lstsq(design, np.log(series[positive]), rcond=None)[0]
+        return {'origin': dates[0], 'coefficients': coefficients}
+    
+    def _project_exponential(self, params, dates, forecast_dates):
+        t = self._days(forecast_dates, params['origin'])
+        rate, log_intercept = params['coefficients']
+        return np.exp(rate[:, None] * t + log_intercept[:, None])
+    
+    def _fit_holt_winters(self, dates, history):
+        """Final level, trend and seasonal terms of each series' month-end balances"""
+        fits = []
+        for series in history:
+            months, closing = month_end_values(dates, series)
+            # Months without records carry the previous balance forward
+            all_months = np.arange(months[0], months[-1] + 1)
+            closing = closing[np.searchsorted(months, all_months, side='right') - 1]
+            fits.append(self._holt_winters(closing))
+        return {'last_month': dates[-1].astype('datetime64[M]'), 'fits': fits}
+    
+    def _holt_winters(self, values):
+        """Additive Holt-Winters over a monthly series"""
+        alpha, beta, gamma = self.HOLT_WINTERS_ALPHA, self.HOLT_WINTERS_BETA, self.HOLT_WINTERS_GAMMA
+        period = self.SEASON_MONTHS if len(values) >= 2 * self.SEASON_MONTHS else 0
+        
+        if period:
+            level = values[:period].mean()
+            trend = (values[period:2 * period].mean() - level) / period
+            season = values[:period] - level
+        else:
+            level = values[0]
+            trend = values[1] - values[0] if len(values) > 1 else 0.0
+            season = np.zeros(1)
+        
+        for i, value in enumerate(values[1:], start=1):
+            seasonal = season[i % period] if period else 0.0
+            previous_level = level
+            level = alpha * (value - seasonal) + (1 - alpha) * (level + trend)
+            trend = beta * (level - previous_level) + (1 - beta) * trend
+            if period:
+                season[i % period] = gamma * (value - level) + (1 - gamma) * seasonal
+        return {'level': level, 'trend': trend, 'season': season, 'period': period, 'count': len(values)}
+    
+    def _project_holt_winters(self, params, dates, forecast_dates):
+        steps = (forecast_dates.astype('datetime64[M]') - params['last_month']).astype(np.int64)
+        projected = []
+        for fit in params['fits']:
+            seasonal = 0.0
+            if fit['period']:
+                seasonal = fit['season'][(fit['count'] - 1 + steps) % fit['period']]
+            projected.append(fit['level'] + fit['trend'] * steps + seasonal)
+        return np.array(projected)
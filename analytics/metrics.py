@@ -0,0 +1,87 @@
+"""
+Vectorized financial indicators over TimeSeriesStore columns
+"""
+import numpy as np
+
+# Mean length of a year in days, used to annualize growth
+DAYS_PER_YEAR = 365.25
+
+def rolling_mean(values, window: int):
+    """Mean of each value and the window - 1 values before it
+    
+    Missing values (NaN) are left out of the mean. Positions before the window
+    fills, or whose window holds no value at all, are NaN.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    result = np.full(len(values), np.nan)
+    if window < 1 or len(values) < window:
+        return result
+    
+    present = ~np.isnan(values)
+    sums = np.concatenate(([0.0], np.cumsum(np.where(present, values, 0.0))))
+    counts = np.concatenate(([0], np.cumsum(present)))
+    window_sums = sums[window:] - sums[:-window]
+    window_counts = counts[window:] - counts[:-window]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result[window - 1:] = np.where(window_counts > 0, window_sums / window_counts, np.nan)
+    return result
+
+def month_end_values(dates, values):
+    """Months (datetime64[M]) holding records and the last value recorded in each"""
+    months = np.asarray(dates).astype('datetime64[M]')
+    values = np.asarray(values, dtype=np.float64)
+    if not len(months):
+        return months, values
+    
+    # Dates are sorted, so a month ends where the next record is in another month
+    last = np.flatnonzero(np.append(months[1:] != months[:-1], True))
+    return months[last], values[last]
+
+def period_growth(dates, values, months: int = 1):
+    """Growth of month-end values against the value the given number of months earlier
+    
+    months=1 gives month-over-month growth and months=12 year-over-year growth.
+    Returns the months and the growth as a fraction; NaN where the earlier month
+    has no record or its value is zero.
+    """
+    period, closing = month_end_values(dates, values)
+    if not len(period):
+        return period, closing
+    
+    earlier_month = period - np.timedelta64(months, 'M')
+    earlier = np.minimum(np.searchsorted(period, earlier_month), len(period) - 1)
+    found = period[earlier] == earlier_month
+    base = closing[earlier]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth = np.where(found & (base != 0), closing / base - 1.0, np.nan)
+    return period, growth
+
+def cagr(dates, values) -> float:
+    """Compound annual growth rate between the first and last value, as a fraction"""
+    values = np.asarray(values, dtype=np.float64)
+    present = np.flatnonzero(~np.isnan(values))
+    if len(present) < 2:
+        return float('nan')
+    
+    first, last = present[0], present[-1]
+    years = (dates[last] - dates[first]).astype('timedelta64[D]').astype(np.float64) / DAYS_PER_YEAR
+    if years <= 0 or values[first] <= 0 or values[last] < 0:
+        return float('nan')
+    return float((values[last] / values[first]) ** (1.0 / years) - 1.0)
+
+def contributions(names, values, index: int = -1):
+    """Amount and share of the total of each value name in one record
+    
+    values is the store's (value name x date) matrix and index the record
+    position. Returns (name, amount, share) tuples, largest amount first,
+    for the names the record holds.
+    """
+    if not len(names) or not values.shape[1]:
+        return []
+    
+    column = values[:, index]
+    present = np.flatnonzero(~np.isnan(column))
+    total = column[present].sum()
+    order = present[np.argsort(-column[present], kind='stable')]
+    share = column[order] / total if total else np.full(len(order), np.nan)
+    return [(names[i], float(column[i]), float(s)) for i, s in zip(order, share)]
@@ -0,0 +1,185 @@
+"""
+Columnar in-memory copy of the record history for analytics
+"""
+import threading
+import numpy as np
+
+class TimeSeriesStore:
+    """Record totals and values as NumPy columns aligned on one date axis
+    
+    dates holds one datetime64 per record, oldest first, and totals,
+    totals_with_fgts and fgts are float64 arrays along it. values is a
+    (value name x date) float64 matrix, NaN where a record has no value of
+    that name, with its rows in the order of names.
+    
+    The columns are loaded once from the database and then kept current by
+    apply_upsert/apply_delete after each write. A write the store was not told
+    about (detected through DatabaseManager.generation) makes the next sync
+    reload everything. Updates replace the arrays instead of changing them,
+    so a snapshot stays consistent while the store moves on.
+    """
+    
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+        self._lock = threading.RLock()
+        self._generation = None
+        self._set_columns(np.array([], dtype='datetime64[D]'), np.array([]), np.array([]), [],
+                          np.empty((0, 0)))
+    
+    def _set_columns(self, dates, totals, totals_with_fgts, names, values):
+        self.dates = dates
+        self.totals = totals
+        self.totals_with_fgts = totals_with_fgts
+        self.fgts = totals_with_fgts - totals
+        self.names = list(names)
+        self.values = values
+    
+    def load(self):
+        """Rebuild every column from the database"""
+        with self._lock:
+            generation = self.db_manager.generation
+            columns, rows = self.db_manager.get_series_rows()
+            dates = np.array(columns['date_key'], dtype='datetime64[D]')
+            totals = np.array(columns['total'], dtype=np.float64)
+            totals_with_fgts = np.array(columns['total_with_fgts'], dtype=np.float64)
+            
+            # Place each value by its record ID, then by its name in sorted order
+            ids = np.array(columns['id'], dtype=np.int64)
+            by_id = np.argsort(ids)
+            record_ids = np.fromiter((row[0] for row in rows), np.int64, len(rows))
+            date_index = by_id[np.searchsorted(ids, record_ids, sorter=by_id)]
+            
+            first_seen = {}
+            name_index = np.fromiter((first_seen.setdefault(row[1], len(first_seen)) for row in rows),
+                                     np.intp, len(rows))
+            names = sorted(first_seen)
+            rank = {name: i for i, name in enumerate(names)}
+            name_index = np.array([rank[name] for name in first_seen], dtype=np.intp)[name_index]
+            
+            amounts = np.fromiter((row[2] for row in rows), np.float64, len(rows))
+            values = self._pivot(len(names), len(dates), name_index, date_index, amounts)
+            
+            self._set_columns(dates, totals, totals_with_fgts, names, values)
+            self._generation = generation
+    
+    @staticmethod
+    def _pivot(name_count, date_count, name_index, date_index, amounts):
+        """Build the value matrix, adding up repeated names within a record"""
+        values = np.zeros((name_count, date_count))
+        np.add.at(values, (name_index, date_index), amounts)
+        present = np.zeros((name_count, date_count), dtype=bool)
+        present[name_index, date_index] = True
+        values[~present] = np.nan
+        return values
+    
+    def sync(self):
+        """Reload if the database changed through writes the store was not told about"""
+        with self._lock:
+            if self._generation != self.db_manager.generation:
+                self.load()
+    
+    def _missed_writes(self, generation: int) -> bool:
+        """Whether more than the one write being applied happened between the last update and generation"""
+        return generation != self._generation + 1
+    
+    def _position(self, date_key):
+        """Index of date_key on the date axis and whether a record is already there"""
+        position = int(np.searchsorted(self.dates, date_key))
+        return position, position < len(self.dates) and self.dates[position] == date_key
+    
+    def apply_upsert(self, date: str):
+        """Add (or replace) the column of a record just written at date"""
+        with self._lock:
+            # Read once: a write committing meanwhile must still be seen as unapplied by the next sync
+            generation = self.db_manager.generation
+            if self._generation is None or self._generation == generation:
+                return  # Not loaded yet, or the write did not commit
+            if self._missed_writes(generation):
+                self.load()
+                return
+            
+            record = self.db_manager.get_record_by_date(date)
+            if record is None:
+                self.load()
+                return
+            
+            date_key = np.datetime64(self.db_manager.to_date_key(date), 'D')
+            position, exists = self._position(date_key)
+            
+            # New value names get rows of their own, keeping names sorted
+            record_names = {value['name'] for value in record['values']}
+            names = sorted(set(self.names) | record_names)
+            values = self.values
+            if len(names) != len(self.names):
+                values = np.full((len(names), len(self.dates)), np.nan)
+                values[[names.index(name) for name in self.names]] = self.values
+            
+            column = np.full(len(names), np.nan)
+            for value in record['values']:
+                row = names.index(value['name'])
+                column[row] = value['amount'] if np.isnan(column[row]) else column[row] + value['amount']
+            
+            if exists:
+                dates = self.dates
+                totals = self.totals.copy()
+                totals[position] = record['total']
+                totals_with_fgts = self.totals_with_fgts.copy()
+                totals_with_fgts[position] = record['total_with_fgts']
+                values = values.copy() if values is self.values else values
+                values[:, position] = column
+            else:
+                dates = np.insert(self.dates, position, date_key)
+                totals = np.insert(self.totals, position, record['total'])
+                totals_with_fgts = np.insert(self.totals_with_fgts, position, record['total_with_fgts'])
+                values = np.insert(values, position, column, axis=1)
+            
+            # A replaced record may have held the last value of some name
+            if exists:
+                names, values = self._drop_empty_names(names, values, set(self.names) - record_names)
+            self._set_columns(dates, totals, totals_with_fgts, names, values)
+            self._generation = generation
+    
+    def apply_delete(self, date: str):
+        """Remove the column of a record just deleted at date"""
+        with self._lock:
+            generation = self.db_manager.generation
+            if self._generation is None or self._generation == generation:
+                return
+            if self._missed_writes(generation):
+                self.load()
+                return
+            
+            position, exists = self._position(np.datetime64(self.db_manager.to_date_key(date), 'D'))
+            if not exists:
+                self.load()
+                return
+            
+            removed_names = {name for name, amount in zip(self.names, self.values[:, position])
+                             if not np.isnan(amount)}
+            names, values = self._drop_empty_names(self.names, np.delete(self.values, position, axis=1),
+                                                   removed_names)
+            self._set_columns(np.delete(self.dates, position), np.delete(self.totals, position),
+                              np.delete(self.totals_with_fgts, position), names, values)
+            self._generation = generation
+    
+    @staticmethod
+    def _drop_empty_names(names, values, candidates):
+        """Remove the rows of candidate names that no longer hold any value"""
+        empty = [i for i, name in enumerate(names)
+                 if name in candidates and np.isnan(values[i]).all()]
+        if not empty:
+            return names, values
+        return [name for i, name in enumerate(names) if i not in empty], np.delete(values, empty, axis=0)
+    
+    def snapshot(self):
+        """Current columns, synced with the database; safe to read while the store updates"""
+        with self._lock:
+            self.sync()
+            return {
+                'dates': self.dates,
+                'totals': self.totals,
+                'totals_with_fgts': self.totals_with_fgts,
+                'fgts': self.fgts,
+                'names': self.names,
+                'values': self.values,
+            }
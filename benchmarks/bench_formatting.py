@@ -0,0 +1,87 @@
+"""
+Micro-benchmark of currency formatting against the previous triple-replace implementation
+
+Two workloads: formatting distinct amounts once each (every call misses the
+cache) and formatting the same table pages repeatedly, as scrolling the
+records table back and forth does. Each timing is the best of --runs runs.
+Before timing, the output is checked against the previous implementation;
+the only intended difference is that -0.0 formats without its sign.
+
+Run from the project root:
+    python -m benchmarks.bench_formatting --amounts 100000 --page-rows 50 --values 20
+"""
+import argparse
+import json
+import random
+import time
+from utils import formatting
+
+def legacy_format_currency(value):
+    """Previous FinancialRecord.format_currency"""
+    return f"R$ {value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+def check_negative_zero():
+    """-0.0 equals 0.0 as a cache key, so both format as zero without a sign"""
+    assert legacy_format_currency(-0.0) == "R$ -0,00"
+    for value in (-0.0, 0.0):
+        assert formatting.format_currency(value) == "R$ 0,00", value
+        assert formatting.format_percentage(value) == "0.00%", value
+    # Amounts that only round to zero keep their sign, as before
+    assert formatting.format_currency(-0.001) == legacy_format_currency(-0.001) == "R$ -0,00"
+
+def best_of(runs, func, amounts, cold=False):
+    """Shortest time of formatting every amount with func"""
+    best = None
+    for _ in range(runs):
+        if cold:
+            formatting.format_currency.cache_clear()
+        start = time.perf_counter()
+        for amount in amounts:
+            func(amount)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark currency formatting")
+    parser.add_argument('--amounts', type=int, default=100000, help="distinct amounts of the cold workload")
+    parser.add_argument('--page-rows', type=int, default=50)
+    parser.add_argument('--values', type=int, default=20, help="value columns per row")
+    parser.add_argument('--scrolls', type=int, default=200, help="times the pages are formatted again")
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+    
+    rng = random.Random(42)
+    distinct = [round(rng.uniform(-1e6, 1e7), 2) for _ in range(args.amounts)]
+    for amount in distinct:
+        assert formatting.format_currency(amount) == legacy_format_currency(amount), amount
+    check_negative_zero()
+    
+    # Two pages of rows: value columns plus the seven summary columns
+    page = [round(rng.uniform(0, 1e5), 2) for _ in range(2 * args.page_rows * (args.values + 7))]
+    scrolling = page * args.scrolls
+    
+    results = {
+        'distinct_amounts': {
+            'legacy': best_of(args.runs, legacy_format_currency, distinct),
+            'current': best_of(args.runs, formatting.format_currency, distinct, cold=True),
+        },
+        'scrolling_pages': {
+            'legacy': best_of(args.runs, legacy_format_currency, scrolling),
+            'current': best_of(args.runs, formatting.format_currency, scrolling),
+        },
+    }
+    for result in results.values():
+        result['speedup'] = result['legacy'] / result['current']
+    
+    print(json.dumps({
+        'amounts': args.amounts,
+        'page_rows': args.page_rows,
+        'values': args.values,
+        'scrolls': args.scrolls,
+        'runs': args.runs,
+        'results': results,
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark of building records from query rows: dictionaries against CompactRecord
+
+Both builders group the same rows fetched by get_records. The legacy one
+makes the dictionary per record and per value the database layer used to
+return; the current one makes a CompactRecord per record. Time is the best of
+--runs runs, memory the tracemalloc peak of holding every record built.
+
+Run from the project root:
+    python -m benchmarks.bench_records --records 10000 --values 50
+"""
+import argparse
+import gc
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from benchmarks.synthetic import build_history
+
+def legacy_build_records(rows):
+    """Previous get_records grouping: one dictionary per record and per value"""
+    records = []
+    current_id = None
+    for row in rows:
+        if row[0] != current_id:
+            current_id = row[0]
+            records.append({
+                'id': row[0], 'date': row[1], 'fgts': row[2], 'total': row[3],
+                'total_with_fgts': row[4], 'percentage_diff': row[5], 'real_increase': row[6],
+                'total_percentage_diff': row[7], 'total_real_diff': row[8], 'created_at': row[9],
+                'values': [],
+            })
+        if row[11] is not None:
+            records[-1]['values'].append({'name': row[11], 'amount': row[12],
+                                          'order': len(records[-1]['values'])})
+    return records
+
+def fetch_rows(db):
+    """Rows of every record as get_records reads them"""
+    cursor = db.get_connection().cursor()
+    cursor.execute(f'''
+        SELECT {db.record_columns('dr')}, dr.date_key, vc.name, rv.value_amount
+        FROM daily_records dr
+        LEFT JOIN record_values rv ON dr.id = rv.daily_record_id
+        LEFT JOIN value_columns vc ON vc.id = rv.value_column_id
+        ORDER BY dr.date_key DESC, rv.order_index ASC
+    ''')
+    return cursor.fetchall()
+
+def measure(build, rows, runs):
+    """Best time of build(rows) and the peak memory of the records it returns"""
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        build(rows)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    
+    gc.collect()
+    tracemalloc.start()
+    records = build(rows)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del records
+    return {'seconds': best, 'peak_bytes': peak}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark building records from query rows")
+    parser.add_argument('--records', type=int, default=10000)
+    parser.add_argument('--values', type=int, default=50)
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as work_dir:
+        db = build_history(os.path.join(work_dir, "records.db"), args.records, args.values)
+        rows = fetch_rows(db)
+        results = {
+            'legacy': measure(legacy_build_records, rows, args.runs),
+            'compact': measure(lambda rows: list(db._build_records(rows)), rows, args.runs),
+        }
+        db.close()
+    
+    report = {
+        'records': args.records,
+        'values': args.values,
+        'rows': len(rows),
+        'results': results,
+        'speedup': results['legacy']['seconds'] / results['compact']['seconds'],
+        'memory_ratio': results['legacy']['peak_bytes'] / results['compact']['peak_bytes'],
+    }
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Startup benchmark: import-time profile of the GUI modules
+
+Each module is imported in a fresh interpreter with -X importtime, so the
+numbers are cold-start costs. gui.main_window is what the window waits for;
+gui.charts (matplotlib and numpy) is loaded in the background afterwards.
+
+Run from the project root:
+    python -m benchmarks.bench_startup --runs 5
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# "import time:       self [us] |   cumulative | imported package"
+IMPORT_TIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+def profile_import(module):
+    """Import module in a new interpreter and parse its import-time report"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+                            cwd=PROJECT_ROOT, capture_output=True, text=True, check=True)
+    imports = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            imports.append({'module': name, 'self_us': int(self_us),
+                            'cumulative_us': int(cumulative_us), 'depth': len(indent) // 2})
+    return imports
+
+def summarize(module, runs, top):
+    """Best of several runs, with the slowest top-level imports of the best run"""
+    best = None
+    for _ in range(runs):
+        imports = profile_import(module)
+        total = next(entry['cumulative_us'] for entry in imports if entry['module'] == module)
+        if best is None or total < best[0]:
+            best = (total, imports)
+    
+    total, imports = best
+    names = {entry['module'] for entry in imports}
+    direct = [entry for entry in imports if entry['depth'] == 1]
+    return {
+        'seconds': total / 1e6,
+        'modules_imported': len(imports),
+        'imports_matplotlib': 'matplotlib' in names,
+        'imports_numpy': 'numpy' in names,
+        'slowest_direct_imports': [
+            {'module': entry['module'], 'seconds': entry['cumulative_us'] / 1e6}
+            for entry in sorted(direct, key=lambda entry: entry['cumulative_us'], reverse=True)[:top]
+        ],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark GUI import time")
+    parser.add_argument('--runs', type=int, default=5, help="fresh interpreters per module (best is kept)")
+    parser.add_argument('--top', type=int, default=10, help="slowest direct imports to list")
+    args = parser.parse_args()
+    
+    report = {
+        'python': sys.version.split()[0],
+        'runs': args.runs,
+        # Blocks the window from appearing
+        'gui.main_window': summarize('gui.main_window', args.runs, args.top),
+        # Loaded on a worker thread after the window is up
+        'gui.charts': summarize('gui.charts', args.runs, args.top),
+    }
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
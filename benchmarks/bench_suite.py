@@ -0,0 +1,157 @@
+"""
+Benchmark suite: database operations and chart creation on synthetic histories
+
+For every combination of history length and value count a synthetic database
+is built in a temporary directory. Reads are timed on it directly, writes on
+a fresh copy per run, and charts with the Agg backend so no display is
+needed. Each timing is the best of --runs runs, in seconds. The JSON report
+can be saved with --output and compared between versions.
+
+Run from the project root:
+    python -m benchmarks.bench_suite --days 1000 10000 100000 --values 5 50 --output bench.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import sqlite3
+import tempfile
+import time
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from benchmarks.synthetic import build_history, value_names
+from database.db_manager import DatabaseManager
+from gui.charts import FinancialCharts
+from gui.theme import DarkTheme
+from analytics.forecast import TrendForecaster
+
+# Day after the last synthetic record for the default history lengths
+NEW_DAY = '01/01/2300'
+
+def best_of(runs, func):
+    """Shortest wall time of func over several runs"""
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def best_on_copy(seed_path, work_dir, runs, operation, setup=None):
+    """Shortest time of operation(db) over several runs, each on a fresh copy of the seed database
+    
+    setup(db), when given, runs on the copy before the timing starts.
+    """
+    best = None
+    for run in range(runs):
+        path = os.path.join(work_dir, f"copy_{run}.db")
+        shutil.copy(seed_path, path)
+        with DatabaseManager(path) as db:
+            if setup is not None:
+                setup(db)
+            start = time.perf_counter()
+            operation(db)
+            elapsed = time.perf_counter() - start
+        os.remove(path)
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def bench_database(db, seed_path, work_dir, value_count, runs):
+    """Time the record and value column operations
+    
+    Writes run on copies of seed_path, which must not have uncheckpointed writes.
+    """
+    names = value_names(value_count)
+    values = [(name, 1234.56) for name in names]
+    latest = db.get_latest_record()
+    return {
+        'insert_record_new_day': best_on_copy(
+            seed_path, work_dir, runs, lambda copy: copy.insert_record(NEW_DAY, values, 100.0)),
+        'insert_record_replace_day': best_on_copy(
+            seed_path, work_dir, runs, lambda copy: copy.insert_record(latest['date'], values, 100.0)),
+        'get_all_records': best_of(runs, db.get_all_records),
+        'delete_value_column': best_on_copy(
+            seed_path, work_dir, runs, lambda copy: copy.delete_value_column(names[0])),
+        'rename_value_column': best_on_copy(
+            seed_path, work_dir, runs, lambda copy: copy.rename_value_column(names[0], "Renomeada")),
+        'undo_delete_value_column': best_on_copy(
+            seed_path, work_dir, runs, lambda copy: copy.undo(),
+            setup=lambda copy: copy.delete_value_column(names[0])),
+        'undo_delete_record': best_on_copy(
+            seed_path, work_dir, runs, lambda copy: copy.undo(),
+            setup=lambda copy: copy.delete_record(latest['id'])),
+    }
+
+def bench_charts(db, runs):
+    """Time building and rendering each chart from the data the dashboard loads"""
+    charts = FinancialCharts(None, DarkTheme.COLORS)
+    series = charts.prepare_series(db.get_summary_columns())
+    growth = charts.prepare_growth_series(db.get_period_summaries('month'))
+    latest_records = db.get_records(limit=1)
+    forecast = TrendForecaster(db).forecast('linear', 12)
+    
+    builders = {
+        'create_evolution_chart': lambda: charts.create_evolution_chart(series),
+        'create_values_breakdown_chart': lambda: charts.create_values_breakdown_chart(latest_records),
+        'create_growth_chart': lambda: charts.create_growth_chart(growth),
+        'create_projection_chart': lambda: charts.create_projection_chart(forecast),
+    }
+    results = {}
+    for name, build in builders.items():
+        figure = build()
+        canvas = FigureCanvasAgg(figure)
+        results[name] = {
+            'create': best_of(runs, build),
+            'draw': best_of(runs, canvas.draw),
+        }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark database operations and charts")
+    parser.add_argument('--days', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--values', type=int, nargs='+', default=[5, 50])
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--output', help="file the JSON report is written to (default: stdout)")
+    args = parser.parse_args()
+    
+    # The theme font is usually missing where benchmarks run
+    logging.getLogger('matplotlib.font_manager').setLevel(logging.ERROR)
+    
+    results = []
+    for days in args.days:
+        for value_count in args.values:
+            with tempfile.TemporaryDirectory() as work_dir:
+                seed_path = os.path.join(work_dir, "seed.db")
+                start = time.perf_counter()
+                build_history(seed_path, days, value_count).close()
+                build_seconds = time.perf_counter() - start
+                
+                # Closing checkpointed the WAL, so copies of the seed file hold the whole history
+                with DatabaseManager(seed_path) as db:
+                    results.append({
+                        'days': days,
+                        'values': value_count,
+                        'build_seconds': build_seconds,
+                        'database': bench_database(db, seed_path, work_dir, value_count, args.runs),
+                        'charts': bench_charts(db, args.runs),
+                    })
+    
+    report = {
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'matplotlib': matplotlib.__version__,
+        'runs': args.runs,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
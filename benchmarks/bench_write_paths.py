@@ -0,0 +1,131 @@
+"""
+Benchmark of the record_values write paths against the previous per-row implementation
+
+Run from the project root:
+    python -m benchmarks.bench_write_paths --records 10000 --values 50
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from benchmarks.synthetic import build_history, value_names
+
+def legacy_insert_values(cursor, record_id, values):
+    """Previous insert_record loop: one execute per value"""
+    for i, (column_id, value_amount) in enumerate(values):
+        cursor.execute('''
+            INSERT INTO record_values (daily_record_id, value_column_id, value_amount, order_index)
+            VALUES (?, ?, ?, ?)
+        ''', (record_id, column_id, value_amount, i))
+
+def batched_insert_values(cursor, record_id, values):
+    """Current insert_record write: a single executemany"""
+    cursor.executemany('''
+        INSERT INTO record_values (daily_record_id, value_column_id, value_amount, order_index)
+        VALUES (?, ?, ?, ?)
+    ''', [(record_id, column_id, value_amount, i) for i, (column_id, value_amount) in enumerate(values)])
+
+def legacy_delete_value_column(cursor, column_name):
+    """Previous delete_value_column: SELECT/SELECT/UPDATE per affected record"""
+    cursor.execute('SELECT id FROM value_columns WHERE name = ?', (column_name,))
+    column_id = cursor.fetchone()[0]
+    cursor.execute('DELETE FROM record_values WHERE value_column_id = ?', (column_id,))
+    cursor.execute('''
+        SELECT DISTINCT daily_record_id FROM record_values rv
+        WHERE daily_record_id IN (
+            SELECT DISTINCT daily_record_id FROM record_values WHERE value_column_id != ?
+        )
+    ''', (column_id,))
+    for (record_id,) in cursor.fetchall():
+        cursor.execute('SELECT SUM(value_amount) FROM record_values WHERE daily_record_id = ?', (record_id,))
+        new_total = cursor.fetchone()[0] or 0
+        cursor.execute('SELECT fgts FROM daily_records WHERE id = ?', (record_id,))
+        fgts = cursor.fetchone()[0] or 0
+        cursor.execute('UPDATE daily_records SET total = ?, total_with_fgts = ? WHERE id = ?',
+                       (new_total, new_total + fgts, record_id))
+
+def set_based_delete_value_column(cursor, column_name):
+    """Current delete_value_column totals update, without the diff, summary and journal work legacy skips"""
+    cursor.execute('SELECT id FROM value_columns WHERE name = ?', (column_name,))
+    column_id = cursor.fetchone()[0]
+    cursor.execute('''
+        UPDATE daily_records
+        SET total = remaining.total,
+            total_with_fgts = remaining.total + daily_records.fgts
+        FROM (
+            SELECT daily_record_id AS id,
+                   SUM(CASE WHEN value_column_id = ? THEN 0 ELSE value_amount END) AS total
+            FROM record_values
+            WHERE daily_record_id IN (SELECT daily_record_id FROM record_values WHERE value_column_id = ?)
+            GROUP BY daily_record_id
+        ) AS remaining
+        WHERE daily_records.id = remaining.id
+    ''', (column_id, column_id))
+    cursor.execute('DELETE FROM record_values WHERE value_column_id = ?', (column_id,))
+
+def time_call(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+def bench_insert_values(db, value_count, batches):
+    """Time writing value rows for new records with both implementations"""
+    cursor = db.get_connection().cursor()
+    cursor.execute('SELECT id FROM value_columns ORDER BY display_order LIMIT ?', (value_count,))
+    values = [(row[0], 1234.56) for row in cursor.fetchall()]
+    # Values must belong to existing records, so extra rows are added to them and removed afterwards
+    cursor.execute('SELECT id FROM daily_records ORDER BY id LIMIT ?', (batches,))
+    record_ids = [row[0] for row in cursor.fetchall()]
+    results = {}
+    for label, writer in (('legacy', legacy_insert_values), ('batched', batched_insert_values)):
+        with db.transaction() as cursor:
+            cursor.execute('SELECT MAX(id) FROM record_values')
+            last_value_id = cursor.fetchone()[0]
+            start = time.perf_counter()
+            for record_id in record_ids:
+                writer(cursor, record_id, values)
+            results[label] = time.perf_counter() - start
+            cursor.execute('DELETE FROM record_values WHERE id > ?', (last_value_id,))
+    return results
+
+def bench_delete_value_column(seed_path, work_dir):
+    """Time deleting one value column and updating the totals on copies of the same database"""
+    from database.db_manager import DatabaseManager
+    column_name = value_names(1)[0]
+    results = {}
+    for label, delete in (('legacy', legacy_delete_value_column), ('set_based', set_based_delete_value_column)):
+        path = os.path.join(work_dir, f"{label}.db")
+        shutil.copy(seed_path, path)
+        with DatabaseManager(path) as db:
+            with db.transaction() as cursor:
+                results[label] = time_call(delete, cursor, column_name)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark record_values write paths")
+    parser.add_argument('--records', type=int, default=10000)
+    parser.add_argument('--values', type=int, default=50)
+    parser.add_argument('--inserts', type=int, default=1000, help="records written by the insert benchmark")
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as work_dir:
+        seed_path = os.path.join(work_dir, "seed.db")
+        db = build_history(seed_path, args.records, args.values)
+        insert_results = bench_insert_values(db, args.values, args.inserts)
+        db.close()
+        delete_results = bench_delete_value_column(seed_path, work_dir)
+    
+    report = {
+        'records': args.records,
+        'values': args.values,
+        'insert_values_seconds': insert_results,
+        'insert_values_speedup': insert_results['legacy'] / insert_results['batched'],
+        'delete_value_column_seconds': delete_results,
+        'delete_value_column_speedup': delete_results['legacy'] / delete_results['set_based'],
+    }
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
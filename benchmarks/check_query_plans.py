@@ -0,0 +1,101 @@
+"""
+Query plan check: the record_values lookups of everyday operations must use an index
+
+Each operation runs against a synthetic history while the executed statements
+are traced. Every traced statement touching record_values is then run through
+EXPLAIN QUERY PLAN, and a full scan of the table fails the check. Operations
+that read every value by design (exports, analytics loads, full rebuilds) are
+not checked.
+
+Run from the project root:
+    python -m benchmarks.check_query_plans --records 1000 --values 10
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+from benchmarks.synthetic import build_history, value_names
+
+# Names record_values goes by in the queries of DatabaseManager
+RECORD_VALUES_NAMES = {'record_values', 'rv'}
+
+# "SCAN rv" or "SCAN record_values USING COVERING INDEX ..."
+SCAN_DETAIL = re.compile(r'^SCAN (\w+)')
+
+def operations(db, value_count):
+    """(label, callable) of the operations whose record_values access is checked"""
+    names = value_names(value_count)
+    latest = db.get_latest_record()
+    return [
+        ('get_records_page', lambda: db.get_records(limit=50)),
+        ('get_record_by_date', lambda: db.get_record_by_date(latest['date'])),
+        ('insert_record_new_day', lambda: db.insert_record('01/01/1999', [(names[0], 10.0)], 0.0)),
+        ('insert_record_replace_day', lambda: db.insert_record(latest['date'], [(names[0], 20.0)], 0.0)),
+        ('delete_record', lambda: db.delete_record(db.get_record_by_date('01/01/1999')['id'])),
+        ('rename_value_column', lambda: db.rename_value_column(names[-1], f"{names[-1]} renomeada")),
+        ('rename_value_column_merge', lambda: db.rename_value_column(f"{names[-1]} renomeada", names[0])),
+        ('delete_value_column', lambda: db.delete_value_column(names[1])),
+        ('undo_delete_value_column', db.undo),
+        ('undo_rename_value_column_merge', db.undo),
+        ('redo_rename_value_column_merge', db.redo),
+        # The merge again, then the plain rename before it
+        ('undo_rename_value_column', lambda: (db.undo(), db.undo())),
+        ('undo_delete_record', db.undo),
+    ]
+
+def record_values_scans(cursor, statement):
+    """Plan lines of a statement that scan record_values from end to end"""
+    cursor.execute(f"EXPLAIN QUERY PLAN {statement}")
+    scans = []
+    for row in cursor.fetchall():
+        match = SCAN_DETAIL.match(row[3])
+        if match and match.group(1) in RECORD_VALUES_NAMES:
+            scans.append(row[3])
+    return scans
+
+def check_operation(db, func):
+    """Run one operation and return its traced statements with their record_values scans"""
+    conn = db.get_connection()
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        func()
+    finally:
+        conn.set_trace_callback(None)
+    
+    cursor = conn.cursor()
+    checked = []
+    for statement in statements:
+        if 'record_values' not in statement or not statement.lstrip().upper().startswith(
+                ('SELECT', 'INSERT', 'UPDATE', 'DELETE')):
+            continue
+        checked.append({'sql': ' '.join(statement.split()), 'scans': record_values_scans(cursor, statement)})
+    return checked
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that record_values lookups use an index")
+    parser.add_argument('--records', type=int, default=1000)
+    parser.add_argument('--values', type=int, default=10)
+    args = parser.parse_args()
+    
+    report = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        db = build_history(os.path.join(work_dir, "plans.db"), args.records, max(args.values, 3))
+        for label, func in operations(db, max(args.values, 3)):
+            checked = check_operation(db, func)
+            report[label] = {
+                'statements_checked': len(checked),
+                'full_scans': [entry for entry in checked if entry['scans']],
+            }
+        db.close()
+    
+    print(json.dumps(report, indent=2))
+    failed = [label for label, result in report.items() if result['full_scans']]
+    if failed:
+        print(f"record_values scanned by: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
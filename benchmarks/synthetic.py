@@ -0,0 +1,40 @@
+"""
+Synthetic financial histories for benchmarks
+"""
+import random
+from datetime import date, timedelta
+from database.db_manager import DatabaseManager
+
+def value_names(count: int):
+    """Generate value column names"""
+    return [f"Fonte {i + 1:02d}" for i in range(count)]
+
+def build_history(db_path: str, days: int, value_count: int, seed: int = 42) -> DatabaseManager:
+    """Create a database holding one record per day with value_count values each"""
+    rng = random.Random(seed)
+    names = value_names(value_count)
+    start = date(2000, 1, 1)
+    
+    db = DatabaseManager(db_path)
+    with db.transaction() as cursor:
+        cursor.executemany('INSERT INTO value_columns (name, display_order) VALUES (?, ?)',
+                           [(name, i) for i, name in enumerate(names)])
+        cursor.execute('SELECT id FROM value_columns ORDER BY display_order')
+        column_ids = [row[0] for row in cursor.fetchall()]
+        for day in range(days):
+            current = start + timedelta(days=day)
+            amounts = [round(rng.uniform(100, 5000), 2) for _ in names]
+            fgts = round(rng.uniform(0, 1000), 2)
+            total = sum(amounts)
+            cursor.execute('''
+                INSERT INTO daily_records (date, date_key, fgts, total, total_with_fgts)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (current.strftime("%d/%m/%Y"), current.isoformat(), fgts, total, total + fgts))
+            record_id = cursor.lastrowid
+            cursor.executemany('''
+                INSERT INTO record_values (daily_record_id, value_column_id, value_amount, order_index)
+                VALUES (?, ?, ?, ?)
+            ''', [(record_id, column_id, amount, i) for i, (column_id, amount) in enumerate(zip(column_ids, amounts))])
+    db.recompute_all_diffs()
+    db.rebuild_period_summaries()
+    return db
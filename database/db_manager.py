@@ -1,16 +1,144 @@
+import json
 import sqlite3
+import threading
+from contextlib import contextmanager, nullcontext
 from datetime import datetime
-from typing import List, Tuple, Optional, Dict
+from typing import List, Tuple, Optional, Dict, Iterable, Iterator
+from utils.validators import Validators
+from utils.exporters import write_wide_csv, write_columnar
+from models.financial_record import CompactRecord, ValueNameIndex
 
 class DatabaseManager:
+    # Pragmas applied once to every connection opened by the manager
+    CONNECTION_PRAGMAS = (
+        "PRAGMA journal_mode = WAL",
+        "PRAGMA synchronous = NORMAL",
+        "PRAGMA temp_store = MEMORY",
+        "PRAGMA cache_size = -8000",
+        "PRAGMA busy_timeout = 5000",
+        "PRAGMA foreign_keys = ON",
+    )
+    
+    # Number of compiled statements kept per connection
+    STATEMENT_CACHE_SIZE = 128
+    
+    # Rows fetched per round trip when streaming records
+    STREAM_BATCH_SIZE = 1000
+    
+    # Export formats by file extension
+    EXPORT_FORMATS = {'.csv': 'csv', '.fcol': 'columnar'}
+    
+    # Schema version stored in PRAGMA user_version once all migrations ran
+    SCHEMA_VERSION = 6
+    
+    # Undoable changes kept in change_journal, and how many new ones trigger trimming it
+    JOURNAL_SIZE = 200
+    JOURNAL_COMPACT_INTERVAL = 50
+    
+    # Up to this many days written at once, their differences and summaries are refreshed one by one
+    INCREMENTAL_REFRESH_DAYS = 50
+    
+    # Summary columns of daily_records, in the order records are read back
+    RECORD_COLUMNS = ('id', 'date', 'fgts', 'total', 'total_with_fgts', 'percentage_diff',
+                      'real_increase', 'total_percentage_diff', 'total_real_diff', 'created_at')
+    
+    # daily_records fields returned column by column for the charts
+    SUMMARY_SERIES_COLUMNS = ('id', 'date_key', 'total', 'total_with_fgts')
+    
+    # Materialized period summaries: summary table, per-value sums table and
+    # length of the date_key prefix naming a period ('YYYY-MM' or 'YYYY')
+    PERIOD_TABLES = {
+        'month': ('monthly_summary', 'monthly_value_summary', 7),
+        'year': ('yearly_summary', 'yearly_value_summary', 4),
+    }
+    
+    # Definition of record_values, shared by the table creation and its migration
+    RECORD_VALUES_SCHEMA = '''
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        daily_record_id INTEGER NOT NULL,
+        value_column_id INTEGER NOT NULL,
+        value_amount REAL NOT NULL,
+        order_index INTEGER NOT NULL DEFAULT 0,
+        FOREIGN KEY (daily_record_id) REFERENCES daily_records (id) ON DELETE CASCADE,
+        FOREIGN KEY (value_column_id) REFERENCES value_columns (id)
+    '''
+    
+    # Columns of the period summary tables, in the order they are read back
+    PERIOD_SUMMARY_COLUMNS = ('period', 'record_count', 'last_date_key', 'last_total', 'last_total_with_fgts',
+                              'min_total', 'max_total', 'growth', 'growth_percentage')
+    
     def __init__(self, db_path: str = "finance_control.db"):
         self.db_path = db_path
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        # Bumped after every committed transaction so caches can detect writes;
+        # writes happen on several threads, so the increment holds a lock
+        self.generation = 0
+        self._generation_lock = threading.Lock()
+        # Set by Instrumentation.instrument_database to time parts of methods
+        self.instrumentation = None
+        # Value names of every record built, shared so records only store positions
+        self.value_names = ValueNameIndex()
         self.init_database()
     
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def get_connection(self) -> sqlite3.Connection:
+        """Get the long-lived connection owned by the calling thread"""
+        conn = getattr(self._local, 'connection', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path,
+                                   cached_statements=self.STATEMENT_CACHE_SIZE,
+                                   check_same_thread=False)
+            for pragma in self.CONNECTION_PRAGMAS:
+                conn.execute(pragma)
+            self._local.connection = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+    
+    def _span(self, name: str):
+        """Timing span of part of a method, when instrumentation is on"""
+        if self.instrumentation is None:
+            return nullcontext()
+        return self.instrumentation.span(f"DatabaseManager.{name}")
+    
+    @contextmanager
+    def transaction(self):
+        """Yield a cursor whose work is committed on success and rolled back on error"""
+        conn = self.get_connection()
+        with conn:
+            yield conn.cursor()
+        with self._generation_lock:
+            self.generation += 1
+    
+    @contextmanager
+    def read_transaction(self):
+        """Make the reads of the calling thread inside the block see one snapshot of the database"""
+        conn = self.get_connection()
+        conn.execute('BEGIN')
+        try:
+            yield
+        finally:
+            conn.commit()
+    
+    def close(self):
+        """Close every connection opened by the manager"""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+            # Threads holding a closed connection will open a new one on next use
+            self._local = threading.local()
+        for conn in connections:
+            conn.close()
+    
     def init_database(self):
         """Initialize the database with required tables"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
+        with self.transaction() as cursor:
             
             # Main daily records table
             cursor.execute('''
@@ -28,137 +156,710 @@ class DatabaseManager:
                 )
             ''')
             
-            # Individual values table
+            # Value names, stored once and referenced by ID
             cursor.execute('''
-                CREATE TABLE IF NOT EXISTS record_values (
+                CREATE TABLE IF NOT EXISTS value_columns (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    daily_record_id INTEGER NOT NULL,
-                    value_name TEXT NOT NULL,
-                    value_amount REAL NOT NULL,
-                    order_index INTEGER NOT NULL DEFAULT 0,
-                    FOREIGN KEY (daily_record_id) REFERENCES daily_records (id) ON DELETE CASCADE
+                    name TEXT NOT NULL UNIQUE,
+                    display_order INTEGER NOT NULL DEFAULT 0
                 )
             ''')
             
-            conn.commit()
+            # Individual values table
+            cursor.execute(f'CREATE TABLE IF NOT EXISTS record_values ({self.RECORD_VALUES_SCHEMA})')
+            
+            self.migrate_schema(cursor)
+    
+    def migrate_schema(self, cursor):
+        """Bring an existing database up to SCHEMA_VERSION"""
+        cursor.execute('PRAGMA user_version')
+        version = cursor.fetchone()[0]
+        
+        if version < 1:
+            # Sortable ISO-8601 key so chronological queries can use an index
+            cursor.execute('PRAGMA table_info(daily_records)')
+            if 'date_key' not in [row[1] for row in cursor.fetchall()]:
+                cursor.execute('ALTER TABLE daily_records ADD COLUMN date_key TEXT')
+            cursor.execute('SELECT id, date FROM daily_records')
+            cursor.executemany('UPDATE daily_records SET date_key = ? WHERE id = ?',
+                               [(self.to_date_key(date), record_id)
+                                for record_id, date in cursor.fetchall()])
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_daily_records_date_key ON daily_records (date_key)')
+            
+            # Differences were measured against the previous date in text order, not chronological order
+            self._recompute_all_diffs(cursor)
+        
+        if version < 2:
+            # Month and year summaries kept up to date by every write
+            for table, _, _ in self.PERIOD_TABLES.values():
+                cursor.execute(f'''
+                    CREATE TABLE IF NOT EXISTS {table} (
+                        period TEXT PRIMARY KEY,
+                        record_count INTEGER NOT NULL,
+                        last_date_key TEXT NOT NULL,
+                        last_total REAL,
+                        last_total_with_fgts REAL,
+                        min_total REAL,
+                        max_total REAL,
+                        growth REAL,
+                        growth_percentage REAL
+                    )
+                ''')
+        
+        if version < 3:
+            # Values reference value_columns instead of repeating their name
+            cursor.execute('PRAGMA table_info(record_values)')
+            if 'value_name' in [row[1] for row in cursor.fetchall()]:
+                self._normalize_value_names(cursor)
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_record_values_value_column ON record_values (value_column_id)')
+            
+            for _, value_table, _ in self.PERIOD_TABLES.values():
+                cursor.execute(f'DROP TABLE IF EXISTS {value_table}')
+                cursor.execute(f'''
+                    CREATE TABLE {value_table} (
+                        period TEXT NOT NULL,
+                        value_column_id INTEGER NOT NULL,
+                        amount REAL NOT NULL,
+                        PRIMARY KEY (period, value_column_id)
+                    )
+                ''')
+            self._rebuild_period_summaries(cursor)
+        
+        if version < 4:
+            # Foreign keys were not enforced before, so deleted records left their values behind
+            cursor.execute('DELETE FROM record_values WHERE daily_record_id NOT IN (SELECT id FROM daily_records)')
+            cursor.execute('DELETE FROM record_values WHERE value_column_id NOT IN (SELECT id FROM value_columns)')
+            self._prune_value_columns(cursor)
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_record_values_record ON record_values (daily_record_id)')
+        
+        if version < 5:
+            # Changes reverting each write (or, once undone, redoing it), as JSON
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS change_journal (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    description TEXT NOT NULL,
+                    changes TEXT NOT NULL,
+                    undone INTEGER NOT NULL DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+        
+        if version < 6:
+            # Dates were stored as typed, so 5/1/2024 and 05/01/2024 could be two records of one day
+            cursor.execute('''
+                SELECT COUNT(*) FROM daily_records
+                WHERE id NOT IN (SELECT MAX(id) FROM daily_records GROUP BY date_key)
+            ''')
+            duplicates = cursor.fetchone()[0]
+            if duplicates:
+                # The record added last is kept; CASCADE deletes the values of the others
+                print(f"Removing {duplicates} duplicate records of days stored under two dates")
+                cursor.execute('''
+                    DELETE FROM daily_records
+                    WHERE id NOT IN (SELECT MAX(id) FROM daily_records GROUP BY date_key)
+                ''')
+                self._prune_value_columns(cursor)
+                self._recompute_all_diffs(cursor)
+                self._rebuild_period_summaries(cursor)
+            cursor.execute('SELECT id, date FROM daily_records')
+            cursor.executemany('UPDATE daily_records SET date = ? WHERE id = ?',
+                               [(self.normalize_date(date), record_id) for record_id, date in cursor.fetchall()
+                                if self.normalize_date(date) != date])
+            cursor.execute('DROP INDEX IF EXISTS idx_daily_records_date_key')
+            cursor.execute('CREATE UNIQUE INDEX idx_daily_records_date_key ON daily_records (date_key)')
+        
+        if version < self.SCHEMA_VERSION:
+            cursor.execute(f'PRAGMA user_version = {self.SCHEMA_VERSION}')
+    
+    def _normalize_value_names(self, cursor):
+        """Move the value names of record_values into value_columns
+        
+        Names keep their alphabetical listing order. Values left behind by
+        deleted records are dropped along the way.
+        """
+        cursor.execute('''
+            INSERT OR IGNORE INTO value_columns (name, display_order)
+            SELECT value_name, ROW_NUMBER() OVER (ORDER BY value_name) - 1
+            FROM (SELECT DISTINCT value_name FROM record_values
+                  WHERE daily_record_id IN (SELECT id FROM daily_records))
+        ''')
+        cursor.execute(f'CREATE TABLE record_values_normalized ({self.RECORD_VALUES_SCHEMA})')
+        cursor.execute('''
+            INSERT INTO record_values_normalized (id, daily_record_id, value_column_id, value_amount, order_index)
+            SELECT rv.id, rv.daily_record_id, vc.id, rv.value_amount, rv.order_index
+            FROM record_values rv
+            JOIN value_columns vc ON vc.name = rv.value_name
+            WHERE rv.daily_record_id IN (SELECT id FROM daily_records)
+        ''')
+        cursor.execute('DROP TABLE record_values')
+        cursor.execute('ALTER TABLE record_values_normalized RENAME TO record_values')
+    
+    def _value_column_ids(self, cursor, names: Iterable[str]) -> Dict[str, int]:
+        """IDs of every value name, registering new names after the existing ones"""
+        cursor.executemany('''
+            INSERT OR IGNORE INTO value_columns (name, display_order)
+            SELECT ?, COALESCE(MAX(display_order) + 1, 0) FROM value_columns
+        ''', [(name,) for name in dict.fromkeys(names)])
+        cursor.execute('SELECT name, id FROM value_columns')
+        return dict(cursor.fetchall())
+    
+    def _register_value_columns(self, cursor, columns: Iterable[Tuple[str, int]]) -> Dict[str, int]:
+        """IDs of every value name, registering missing (name, display_order) columns as given"""
+        cursor.executemany('INSERT OR IGNORE INTO value_columns (name, display_order) VALUES (?, ?)', columns)
+        cursor.execute('SELECT name, id FROM value_columns')
+        return dict(cursor.fetchall())
+    
+    def _prune_value_columns(self, cursor):
+        """Forget value names no record holds anymore"""
+        cursor.execute('''
+            DELETE FROM value_columns
+            WHERE NOT EXISTS (SELECT 1 FROM record_values WHERE value_column_id = value_columns.id)
+        ''')
+    
+    @classmethod
+    def record_columns(cls, alias: str = "") -> str:
+        """Comma-separated summary column list, optionally qualified by a table alias"""
+        prefix = f"{alias}." if alias else ""
+        return ", ".join(prefix + column for column in cls.RECORD_COLUMNS)
+    
+    @staticmethod
+    def to_date_key(date: str) -> str:
+        """Convert a DD/MM/YYYY date into its sortable YYYY-MM-DD key"""
+        return datetime.strptime(date, "%d/%m/%Y").strftime("%Y-%m-%d")
+    
+    @staticmethod
+    def normalize_date(date: str) -> str:
+        """Write a DD/MM/YYYY date with zero-padded day and month, as it is stored"""
+        return datetime.strptime(date, "%d/%m/%Y").strftime("%d/%m/%Y")
     
     def insert_record(self, date: str, values: List[Tuple[str, float]], fgts: float) -> bool:
         """Insert a new financial record with dynamic values"""
         try:
             total = sum(value[1] for value in values)
             total_with_fgts = total + fgts
+            date = self.normalize_date(date)
+            date_key = self.to_date_key(date)
             
-            # Calculate differences with previous record
-            last_record = self.get_last_record()
-            percentage_diff = 0
-            real_increase = 0
-            total_percentage_diff = 0
-            total_real_diff = 0
-            
-            if last_record:
-                last_total = last_record[3]  # total column
-                last_total_with_fgts = last_record[4]  # total_with_fgts column
-                
-                if last_total > 0:
-                    percentage_diff = ((total - last_total) / last_total) * 100
-                    real_increase = total - last_total
+            with self.transaction() as cursor:
+                previous = self._snapshot_records(cursor, [date])
                 
-                if last_total_with_fgts > 0:
-                    total_percentage_diff = ((total_with_fgts - last_total_with_fgts) / last_total_with_fgts) * 100
-                    total_real_diff = total_with_fgts - last_total_with_fgts
-            
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Insert daily record
+                # Insert daily record (differences are filled in below); an existing day keeps its id
                 cursor.execute('''
-                    INSERT OR REPLACE INTO daily_records 
-                    (date, fgts, total, total_with_fgts, percentage_diff, real_increase, 
-                     total_percentage_diff, total_real_diff)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (date, fgts, total, total_with_fgts, percentage_diff, real_increase,
-                      total_percentage_diff, total_real_diff))
+                    INSERT INTO daily_records (date, date_key, fgts, total, total_with_fgts)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (date_key) DO UPDATE SET
+                        date = excluded.date, fgts = excluded.fgts,
+                        total = excluded.total, total_with_fgts = excluded.total_with_fgts
+                ''', (date, date_key, fgts, total, total_with_fgts))
                 
-                daily_record_id = cursor.lastrowid
+                cursor.execute('SELECT id FROM daily_records WHERE date = ?', (date,))
+                daily_record_id = cursor.fetchone()[0]
                 
                 # Delete existing values for this date (in case of update)
                 cursor.execute('DELETE FROM record_values WHERE daily_record_id = ?', (daily_record_id,))
                 
                 # Insert individual values
-                for i, (value_name, value_amount) in enumerate(values):
-                    cursor.execute('''
-                        INSERT INTO record_values (daily_record_id, value_name, value_amount, order_index)
-                        VALUES (?, ?, ?, ?)
-                    ''', (daily_record_id, value_name, value_amount, i))
+                column_ids = self._value_column_ids(cursor, (value_name for value_name, _ in values))
+                cursor.executemany('''
+                    INSERT INTO record_values (daily_record_id, value_column_id, value_amount, order_index)
+                    VALUES (?, ?, ?, ?)
+                ''', [(daily_record_id, column_ids[value_name], value_amount, i)
+                      for i, (value_name, value_amount) in enumerate(values)])
+                self._prune_value_columns(cursor)
                 
-                conn.commit()
+                # Differences of the new record and of the one that follows it
+                self._refresh_diffs(cursor, date_key)
+                self._refresh_successor_diffs(cursor, date_key)
+                self._refresh_period_summaries(cursor, date_key)
+                self._journal(cursor, f"Registro de {date}", self._restore_changes(previous, [date]))
             return True
         except Exception as e:
             print(f"Error inserting record: {e}")
             return False
     
-    def get_all_records(self) -> List[Dict]:
-        """Get all financial records with their values"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT dr.*, rv.value_name, rv.value_amount, rv.order_index
-                FROM daily_records dr
-                LEFT JOIN record_values rv ON dr.id = rv.daily_record_id
-                ORDER BY dr.date DESC, rv.order_index ASC
-            ''')
+    @staticmethod
+    def calculate_diffs(previous: Optional[Tuple[float, float]], total: float,
+                        total_with_fgts: float) -> Tuple[float, float, float, float]:
+        """Calculate the difference columns against the previous (total, total_with_fgts)
+        
+        Returns (percentage_diff, real_increase, total_percentage_diff, total_real_diff).
+        """
+        percentage_diff = 0
+        real_increase = 0
+        total_percentage_diff = 0
+        total_real_diff = 0
+        
+        if previous:
+            last_total, last_total_with_fgts = previous
+            
+            if last_total > 0:
+                percentage_diff = ((total - last_total) / last_total) * 100
+                real_increase = total - last_total
             
-            records = {}
-            for row in cursor.fetchall():
-                record_id = row[0]
-                if record_id not in records:
-                    records[record_id] = {
-                        'id': row[0],
-                        'date': row[1],
-                        'fgts': row[2],
-                        'total': row[3],
-                        'total_with_fgts': row[4],
-                        'percentage_diff': row[5],
-                        'real_increase': row[6],
-                        'total_percentage_diff': row[7],
-                        'total_real_diff': row[8],
-                        'created_at': row[9],
-                        'values': []
-                    }
+            if last_total_with_fgts > 0:
+                total_percentage_diff = ((total_with_fgts - last_total_with_fgts) / last_total_with_fgts) * 100
+                total_real_diff = total_with_fgts - last_total_with_fgts
+        
+        return percentage_diff, real_increase, total_percentage_diff, total_real_diff
+    
+    def _refresh_diffs(self, cursor, date_key: str):
+        """Recompute the differences of the record at date_key from its predecessor"""
+        cursor.execute('SELECT id, total, total_with_fgts FROM daily_records WHERE date_key = ?', (date_key,))
+        row = cursor.fetchone()
+        if not row:
+            return
+        
+        cursor.execute('''
+            SELECT total, total_with_fgts FROM daily_records
+            WHERE date_key < ? ORDER BY date_key DESC LIMIT 1
+        ''', (date_key,))
+        diffs = self.calculate_diffs(cursor.fetchone(), row[1], row[2])
+        
+        cursor.execute('''
+            UPDATE daily_records
+            SET percentage_diff = ?, real_increase = ?, total_percentage_diff = ?, total_real_diff = ?
+            WHERE id = ?
+        ''', diffs + (row[0],))
+    
+    def _refresh_successor_diffs(self, cursor, date_key: str):
+        """Recompute the differences of the first record after date_key"""
+        cursor.execute('''
+            SELECT date_key FROM daily_records
+            WHERE date_key > ? ORDER BY date_key ASC LIMIT 1
+        ''', (date_key,))
+        row = cursor.fetchone()
+        if row:
+            self._refresh_diffs(cursor, row[0])
+    
+    def _recompute_all_diffs(self, cursor):
+        """Recompute the differences of every record in one set-based statement"""
+        cursor.execute('''
+            UPDATE daily_records
+            SET percentage_diff = CASE WHEN prev.total > 0
+                    THEN (daily_records.total - prev.total) / prev.total * 100 ELSE 0 END,
+                real_increase = CASE WHEN prev.total > 0
+                    THEN daily_records.total - prev.total ELSE 0 END,
+                total_percentage_diff = CASE WHEN prev.total_with_fgts > 0
+                    THEN (daily_records.total_with_fgts - prev.total_with_fgts) / prev.total_with_fgts * 100 ELSE 0 END,
+                total_real_diff = CASE WHEN prev.total_with_fgts > 0
+                    THEN daily_records.total_with_fgts - prev.total_with_fgts ELSE 0 END
+            FROM (
+                SELECT id,
+                       LAG(total) OVER chronological AS total,
+                       LAG(total_with_fgts) OVER chronological AS total_with_fgts
+                FROM daily_records
+                WINDOW chronological AS (ORDER BY date_key)
+            ) AS prev
+            WHERE daily_records.id = prev.id
+        ''')
+    
+    def recompute_all_diffs(self) -> bool:
+        """Rebuild the difference columns of every record"""
+        try:
+            with self.transaction() as cursor:
+                self._recompute_all_diffs(cursor)
+            return True
+        except Exception as e:
+            print(f"Error recomputing differences: {e}")
+            return False
+    
+    def _refresh_period_summaries(self, cursor, date_key: str):
+        """Recompute the month and year summaries holding date_key, and the growth of every period"""
+        for table, value_table, length in self.PERIOD_TABLES.values():
+            self._summarize_periods(cursor, table, value_table, length, date_key[:length])
+            self._refresh_period_growth(cursor, table)
+    
+    def _rebuild_period_summaries(self, cursor, values: bool = True):
+        """Recompute every month and year summary from the daily records
+        
+        With values=False the per-value sums are left as they are, which
+        spares a pass over record_values.
+        """
+        for table, value_table, length in self.PERIOD_TABLES.values():
+            self._summarize_periods(cursor, table, value_table if values else None, length)
+            self._refresh_period_growth(cursor, table)
+    
+    def _summarize_periods(self, cursor, table: str, value_table: Optional[str], length: int,
+                           period: Optional[str] = None):
+        """Rebuild the summary rows of one period, or of every period when period is None
+        
+        The per-value sums are skipped when value_table is None.
+        """
+        if period is None:
+            where, params = "", []
+            cursor.execute(f'DELETE FROM {table}')
+            if value_table:
+                cursor.execute(f'DELETE FROM {value_table}')
+        else:
+            # '~' sorts after the digits and '-' of every date_key starting with period
+            where, params = "WHERE dr.date_key >= ? AND dr.date_key < ?", [period, period + '~']
+            cursor.execute(f'DELETE FROM {table} WHERE period = ?', (period,))
+            if value_table:
+                cursor.execute(f'DELETE FROM {value_table} WHERE period = ?', (period,))
+        
+        cursor.execute(f'''
+            INSERT INTO {table} (period, record_count, last_date_key, min_total, max_total)
+            SELECT substr(dr.date_key, 1, {length}) AS period, COUNT(*), MAX(dr.date_key), MIN(dr.total), MAX(dr.total)
+            FROM daily_records dr {where}
+            GROUP BY period
+        ''', params)
+        cursor.execute(f'''
+            UPDATE {table} SET last_total = dr.total, last_total_with_fgts = dr.total_with_fgts
+            FROM daily_records dr
+            WHERE dr.date_key = {table}.last_date_key {'AND ' + table + '.period = ?' if period else ''}
+        ''', params[:1])
+        if not value_table:
+            return
+        cursor.execute(f'''
+            INSERT INTO {value_table} (period, value_column_id, amount)
+            SELECT substr(dr.date_key, 1, {length}) AS period, rv.value_column_id, SUM(rv.value_amount)
+            FROM daily_records dr
+            JOIN record_values rv ON rv.daily_record_id = dr.id
+            {where}
+            GROUP BY period, rv.value_column_id
+        ''', params)
+    
+    def _refresh_period_growth(self, cursor, table: str):
+        """Recompute the growth of every period from the closing balance of the one before"""
+        cursor.execute(f'''
+            UPDATE {table}
+            SET growth = {table}.last_total - prev.last_total,
+                growth_percentage = CASE WHEN prev.last_total > 0
+                    THEN ({table}.last_total - prev.last_total) / prev.last_total * 100
+                    WHEN prev.last_total IS NOT NULL THEN 0 END
+            FROM (
+                SELECT period, LAG(last_total) OVER (ORDER BY period) AS last_total
+                FROM {table}
+            ) AS prev
+            WHERE {table}.period = prev.period
+        ''')
+    
+    def rebuild_period_summaries(self) -> bool:
+        """Rebuild the month and year summaries, for rows written outside the manager"""
+        try:
+            with self.transaction() as cursor:
+                self._rebuild_period_summaries(cursor)
+            return True
+        except Exception as e:
+            print(f"Error rebuilding summaries: {e}")
+            return False
+    
+    def bulk_import(self, rows: Iterable[Dict[str, str]]) -> Tuple[bool, int, str]:
+        """Import (date, value_name, amount, fgts) rows in a single transaction
+        
+        Rows are validated before anything is written. Each imported day replaces
+        the values stored for that date; a value repeated within a day, or FGTS
+        amounts of one day that disagree, are rejected. Errors point at the row's 'line' in its
+        file when given, else at its position. Returns (success, days imported, error).
+        """
+        days = {}
+        for number, row in enumerate(rows, start=1):
+            where = f"Linha {row['line']}" if row.get('line') else f"Registro {number}"
+            date = row.get('date', '')
+            value_name = row.get('value_name', '')
+            
+            valid, error = Validators.validate_required_fields(data=date, nome=value_name, valor=row.get('amount', ''))
+            if valid:
+                valid, error = Validators.validate_date(date)
+            if not valid:
+                return False, 0, f"{where}: {error}"
+            date = self.normalize_date(date)
+            
+            valid, amount, error = Validators.validate_currency(row['amount'])
+            if not valid:
+                return False, 0, f"{where}: {error}"
+            
+            day = days.setdefault(date, {'values': {}, 'fgts': None})
+            if value_name in day['values']:
+                return False, 0, f"{where}: valor '{value_name}' repetido em {date}"
+            if row.get('fgts'):
+                valid, fgts, error = Validators.validate_currency(row['fgts'])
+                if not valid:
+                    return False, 0, f"{where}: FGTS: {error}"
+                if day['fgts'] is not None and day['fgts'] != fgts:
+                    return False, 0, f"{where}: FGTS diferente do informado antes para {date}"
+                day['fgts'] = fgts
+            day['values'][value_name] = amount
+        
+        if not days:
+            return False, 0, "Nenhum registro encontrado"
+        for day in days.values():
+            if day['fgts'] is None:
+                day['fgts'] = 0.0
+        
+        try:
+            with self.transaction() as cursor:
+                previous = self._snapshot_records(cursor, days)
+                
+                # Upsert keeps the id of days that already exist
+                cursor.executemany('''
+                    INSERT INTO daily_records (date, date_key, fgts, total, total_with_fgts)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (date_key) DO UPDATE SET
+                        date = excluded.date, fgts = excluded.fgts,
+                        total = excluded.total, total_with_fgts = excluded.total_with_fgts
+                ''', [(date, self.to_date_key(date), day['fgts'], sum(day['values'].values()),
+                       sum(day['values'].values()) + day['fgts']) for date, day in days.items()])
                 
-                if row[10]:  # value_name exists
-                    records[record_id]['values'].append({
-                        'name': row[10],
-                        'amount': row[11],
-                        'order': row[12]
-                    })
+                cursor.execute('SELECT id, date FROM daily_records')
+                record_ids = {date: record_id for record_id, date in cursor.fetchall() if date in days}
+                
+                cursor.executemany('DELETE FROM record_values WHERE daily_record_id = ?',
+                                   [(record_id,) for record_id in record_ids.values()])
+                column_ids = self._value_column_ids(cursor, (value_name for day in days.values()
+                                                             for value_name in day['values']))
+                cursor.executemany('''
+                    INSERT INTO record_values (daily_record_id, value_column_id, value_amount, order_index)
+                    VALUES (?, ?, ?, ?)
+                ''', [(record_ids[date], column_ids[value_name], value_amount, i)
+                      for date, day in days.items()
+                      for i, (value_name, value_amount) in enumerate(day['values'].items())])
+                self._prune_value_columns(cursor)
+                
+                # Differences and summaries are computed once for the whole history
+                self._recompute_all_diffs(cursor)
+                self._rebuild_period_summaries(cursor)
+                self._journal(cursor, f"Importação de {len(days)} dias", self._restore_changes(previous, list(days)))
+            return True, len(days), ""
+        except Exception as e:
+            print(f"Error importing records: {e}")
+            return False, 0, str(e)
+    
+    def iter_records(self, batch_size: Optional[int] = None) -> Iterator[CompactRecord]:
+        """Stream every record with its values in chronological order
+        
+        Rows are pulled with fetchmany, so memory use does not grow with the table.
+        """
+        cursor = self.get_connection().cursor()
+        cursor.execute(f'''
+            SELECT {self.record_columns('dr')}, dr.date_key, vc.name, rv.value_amount
+            FROM daily_records dr
+            LEFT JOIN record_values rv ON dr.id = rv.daily_record_id
+            LEFT JOIN value_columns vc ON vc.id = rv.value_column_id
+            ORDER BY dr.date_key ASC, rv.order_index ASC
+        ''')
+        yield from self._build_records(self._fetch_batches(cursor, batch_size or self.STREAM_BATCH_SIZE))
+    
+    @staticmethod
+    def _fetch_batches(cursor, batch_size: int) -> Iterator[Tuple]:
+        """Rows of an executed cursor, pulled batch_size at a time"""
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield from rows
+    
+    def _build_records(self, rows: Iterable[Tuple]) -> Iterator[CompactRecord]:
+        """Group rows of RECORD_COLUMNS, date_key and one value each into records
+        
+        The rows of a record must be consecutive, in value order.
+        """
+        position = self.value_names.position
+        record = None
+        for row in rows:
+            if record is None or record.id != row[0]:
+                if record is not None:
+                    yield record
+                record = CompactRecord(row, self.value_names)
             
-            return list(records.values())
+            if row[11] is not None:  # value_name exists
+                record.value_positions.append(position(row[11]))
+                record.amounts.append(row[12])
+        
+        if record is not None:
+            yield record
+    
+    def export_records(self, path: str, export_format: Optional[str] = None) -> Tuple[bool, int, str]:
+        """Stream all records to a wide CSV or columnar file
+        
+        The format is taken from the extension (.csv or .fcol) unless given.
+        Returns (success, records exported, error).
+        """
+        if export_format is None:
+            extension = path[path.rfind('.'):].lower() if '.' in path else ''
+            export_format = self.EXPORT_FORMATS.get(extension)
+        if export_format not in self.EXPORT_FORMATS.values():
+            return False, 0, f"Formato de exportação não suportado: {export_format or path}"
+        
+        try:
+            writer = write_wide_csv if export_format == 'csv' else write_columnar
+            count = writer(path, self.get_all_value_names(), self.iter_records())
+            return True, count, ""
+        except Exception as e:
+            print(f"Error exporting records: {e}")
+            return False, 0, str(e)
+    
+    def get_all_records(self) -> List[CompactRecord]:
+        """Get all financial records with their values"""
+        return self.get_records()
+    
+    def get_records(self, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                    limit: Optional[int] = None, offset: int = 0,
+                    before_date: Optional[str] = None) -> List[CompactRecord]:
+        """Get records with their values, newest first
+        
+        Dates are DD/MM/YYYY and inclusive. before_date is an exclusive keyset
+        cursor: pass the date of the last record of a page to get the next one.
+        """
+        where, params = self._build_filters(start_date, end_date, before_date)
+        cursor = self.get_connection().cursor()
+        with self._span('get_records.sqlite'):
+            cursor.execute(f'''
+                SELECT {self.record_columns('dr')}, dr.date_key, vc.name, rv.value_amount
+                FROM (
+                    SELECT * FROM daily_records {where}
+                    ORDER BY date_key DESC LIMIT ? OFFSET ?
+                ) dr
+                LEFT JOIN record_values rv ON dr.id = rv.daily_record_id
+                LEFT JOIN value_columns vc ON vc.id = rv.value_column_id
+                ORDER BY dr.date_key DESC, rv.order_index ASC
+            ''', params + [-1 if limit is None else limit, offset])
+            rows = cursor.fetchall()
+        
+        with self._span('get_records.build'):
+            return list(self._build_records(rows))
+    
+    def get_record_summaries(self, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                             limit: Optional[int] = None, offset: int = 0,
+                             before_date: Optional[str] = None) -> List[Dict]:
+        """Get records without their individual values, newest first
+        
+        Takes the same filters as get_records but never touches record_values.
+        """
+        where, params = self._build_filters(start_date, end_date, before_date)
+        cursor = self.get_connection().cursor()
+        cursor.execute(f'''
+            SELECT {self.record_columns()} FROM daily_records {where}
+            ORDER BY date_key DESC LIMIT ? OFFSET ?
+        ''', params + [-1 if limit is None else limit, offset])
+        return [self._row_to_dict(row) for row in cursor.fetchall()]
+    
+    def get_summary_columns(self, start_date: Optional[str] = None,
+                            end_date: Optional[str] = None) -> Dict[str, tuple]:
+        """Get the charted record fields column by column, oldest first
+        
+        Returns one tuple per field in SUMMARY_SERIES_COLUMNS, ready to be turned
+        into arrays without building a dictionary per record.
+        """
+        where, params = self._build_filters(start_date, end_date)
+        cursor = self.get_connection().cursor()
+        cursor.execute(f'''
+            SELECT {', '.join(self.SUMMARY_SERIES_COLUMNS)} FROM daily_records {where}
+            ORDER BY date_key ASC
+        ''', params)
+        rows = cursor.fetchall()
+        columns = zip(*rows) if rows else [()] * len(self.SUMMARY_SERIES_COLUMNS)
+        return dict(zip(self.SUMMARY_SERIES_COLUMNS, columns))
+    
+    def get_period_summaries(self, period: str = 'month') -> Dict[str, tuple]:
+        """Get the materialized month (or year) summaries column by column, oldest first"""
+        table = self.PERIOD_TABLES[period][0]
+        cursor = self.get_connection().cursor()
+        cursor.execute(f'SELECT {", ".join(self.PERIOD_SUMMARY_COLUMNS)} FROM {table} ORDER BY period ASC')
+        rows = cursor.fetchall()
+        columns = zip(*rows) if rows else [()] * len(self.PERIOD_SUMMARY_COLUMNS)
+        return dict(zip(self.PERIOD_SUMMARY_COLUMNS, columns))
+    
+    def get_period_value_sums(self, period: str = 'month') -> List[Tuple[str, str, float]]:
+        """Get (period, value_name, amount) sums of every month (or year), oldest first"""
+        value_table = self.PERIOD_TABLES[period][1]
+        cursor = self.get_connection().cursor()
+        cursor.execute(f'''
+            SELECT s.period, vc.name, s.amount FROM {value_table} s
+            JOIN value_columns vc ON vc.id = s.value_column_id
+            ORDER BY s.period ASC, vc.name ASC
+        ''')
+        return cursor.fetchall()
+    
+    def get_value_rows(self) -> List[Tuple[int, str, float]]:
+        """Get (daily_record_id, value_name, value_amount) of every value, in no particular order"""
+        cursor = self.get_connection().cursor()
+        cursor.execute('''
+            SELECT rv.daily_record_id, vc.name, rv.value_amount FROM record_values rv
+            JOIN value_columns vc ON vc.id = rv.value_column_id
+        ''')
+        return cursor.fetchall()
+    
+    def get_series_rows(self) -> Tuple[Dict[str, tuple], List[Tuple[int, str, float]]]:
+        """get_summary_columns() and get_value_rows(), read from the same snapshot
+        
+        Every value row then belongs to a record of the summary columns, even
+        if a write commits on another thread in between.
+        """
+        with self.read_transaction():
+            return self.get_summary_columns(), self.get_value_rows()
+    
+    def count_records(self, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                      after_date: Optional[str] = None) -> int:
+        """Count records, optionally within a date range or strictly after a date"""
+        where, params = self._build_filters(start_date, end_date, after_date=after_date)
+        cursor = self.get_connection().cursor()
+        cursor.execute(f'SELECT COUNT(*) FROM daily_records {where}', params)
+        return cursor.fetchone()[0]
+    
+    def get_latest_record(self) -> Optional[CompactRecord]:
+        """Get the most recent record with its values"""
+        records = self.get_records(limit=1)
+        return records[0] if records else None
+    
+    def get_adjacent_record(self, date: str, newer: bool = True) -> Optional[CompactRecord]:
+        """Get the record right after (or before) a date, with its values"""
+        cursor = self.get_connection().cursor()
+        cursor.execute(f'''
+            SELECT date FROM daily_records WHERE date_key {'>' if newer else '<'} ?
+            ORDER BY date_key {'ASC' if newer else 'DESC'} LIMIT 1
+        ''', (self.to_date_key(date),))
+        row = cursor.fetchone()
+        return self.get_record_by_date(row[0]) if row else None
+    
+    def _build_filters(self, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                       before_date: Optional[str] = None, after_date: Optional[str] = None) -> Tuple[str, list]:
+        """Build the WHERE clause shared by the record queries"""
+        conditions = []
+        params = []
+        if start_date:
+            conditions.append('date_key >= ?')
+            params.append(self.to_date_key(start_date))
+        if end_date:
+            conditions.append('date_key <= ?')
+            params.append(self.to_date_key(end_date))
+        if before_date:
+            conditions.append('date_key < ?')
+            params.append(self.to_date_key(before_date))
+        if after_date:
+            conditions.append('date_key > ?')
+            params.append(self.to_date_key(after_date))
+        
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return where, params
+    
+    def _row_to_dict(self, row: Tuple) -> Dict:
+        """Map the leading RECORD_COLUMNS of a row to a record dictionary"""
+        return dict(zip(self.RECORD_COLUMNS, row))
     
     def get_last_record(self) -> Optional[Tuple]:
         """Get the most recent financial record"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT * FROM daily_records ORDER BY date DESC LIMIT 1')
-            return cursor.fetchone()
+        cursor = self.get_connection().cursor()
+        cursor.execute(f'SELECT {self.record_columns()} FROM daily_records ORDER BY date_key DESC LIMIT 1')
+        return cursor.fetchone()
     
     def delete_record(self, record_id: int) -> bool:
         """Delete a financial record by ID"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                # Delete from daily_records (CASCADE will handle record_values)
-                cursor.execute('DELETE FROM daily_records WHERE id = ?', (record_id,))
-                conn.commit()
+            with self.transaction() as cursor:
+                cursor.execute('SELECT date FROM daily_records WHERE id = ?', (record_id,))
+                row = cursor.fetchone()
+                if row:
+                    self._journal(cursor, f"Exclusão do registro de {row[0]}", self._delete_records(cursor, [row[0]]))
             return True
         except Exception as e:
             print(f"Error deleting record: {e}")
             return False
     
-    def get_record_by_date(self, date: str) -> Optional[Dict]:
+    def get_record_by_date(self, date: str) -> Optional[CompactRecord]:
         """Get a record by date"""
-        records = self.get_all_records()
-        for record in records:
+        date = self.normalize_date(date)
+        for record in self.get_records(start_date=date, end_date=date):
             if record['date'] == date:
                 return record
         return None
@@ -166,70 +867,156 @@ class DatabaseManager:
     def rename_value_column(self, old_name: str, new_name: str) -> bool:
         """Rename a value column across all records"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    UPDATE record_values 
-                    SET value_name = ? 
-                    WHERE value_name = ?
-                ''', (new_name, old_name))
-                conn.commit()
-                return cursor.rowcount > 0
+            with self.transaction() as cursor:
+                changes = self._rename_value_column(cursor, [old_name, new_name])
+                if changes is None:
+                    return False
+                self._journal(cursor, f"Renomeação da coluna '{old_name}' para '{new_name}'", changes)
+            
+            # Records already built show their values under the new name too
+            self.value_names.rename(old_name, new_name)
+            return True
         except Exception as e:
             print(f"Error renaming column: {e}")
             return False
     
+    def _rename_value_column(self, cursor, names: List[str]) -> Optional[List]:
+        """Rename the column names[0] to names[1]; returns the changes undoing it, None if it does not exist"""
+        old_name, new_name = names
+        cursor.execute('SELECT name, id FROM value_columns WHERE name IN (?, ?)', (old_name, new_name))
+        column_ids = dict(cursor.fetchall())
+        if old_name not in column_ids:
+            return None
+        if old_name == new_name:
+            return []
+        
+        if new_name not in column_ids:
+            cursor.execute('UPDATE value_columns SET name = ? WHERE id = ?', (new_name, column_ids[old_name]))
+            return [['rename_value_column', [new_name, old_name]]]
+        
+        # Renaming onto an existing name merges both columns, and their per-value sums
+        cursor.execute('SELECT display_order FROM value_columns WHERE id = ?', (column_ids[old_name],))
+        display_order = cursor.fetchone()[0]
+        cursor.execute('SELECT daily_record_id, order_index FROM record_values WHERE value_column_id = ?',
+                       (column_ids[old_name],))
+        merged_values = [list(row) for row in cursor.fetchall()]
+        
+        cursor.execute('UPDATE record_values SET value_column_id = ? WHERE value_column_id = ?',
+                       (column_ids[new_name], column_ids[old_name]))
+        for _, value_table, _ in self.PERIOD_TABLES.values():
+            cursor.execute(f'''
+                INSERT INTO {value_table} (period, value_column_id, amount)
+                SELECT period, ?, amount FROM {value_table} WHERE value_column_id = ?
+                ON CONFLICT (period, value_column_id) DO UPDATE SET amount = {value_table}.amount + excluded.amount
+            ''', (column_ids[new_name], column_ids[old_name]))
+            cursor.execute(f'DELETE FROM {value_table} WHERE value_column_id = ?', (column_ids[old_name],))
+        cursor.execute('DELETE FROM value_columns WHERE id = ?', (column_ids[old_name],))
+        return [['split_value_column', {'name': old_name, 'display_order': display_order,
+                                        'merged_into': new_name, 'values': merged_values}]]
+    
+    def _split_value_column(self, cursor, column: Dict) -> List:
+        """Move values merged into another column back under their own name; returns the changes merging them again
+        
+        Values are identified by (record ID, order index), which restored records keep.
+        """
+        column_ids = self._register_value_columns(cursor, [(column['name'], column['display_order'])])
+        column_id, merged_id = column_ids[column['name']], column_ids[column['merged_into']]
+        cursor.executemany('''
+            UPDATE record_values SET value_column_id = ?
+            WHERE daily_record_id = ? AND order_index = ? AND value_column_id = ?
+        ''', [(column_id, record_id, order_index, merged_id) for record_id, order_index in column['values']])
+        self._summarize_value_columns(cursor, [column_id, merged_id])
+        return [['rename_value_column', [column['name'], column['merged_into']]]]
+    
     def delete_value_column(self, column_name: str) -> bool:
         """Delete a value column from all records"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Delete all values with this name
-                cursor.execute('DELETE FROM record_values WHERE value_name = ?', (column_name,))
-                
-                # Recalculate totals for affected records
-                cursor.execute('''
-                    SELECT DISTINCT daily_record_id 
-                    FROM record_values rv
-                    WHERE daily_record_id IN (
-                        SELECT DISTINCT daily_record_id 
-                        FROM record_values 
-                        WHERE value_name != ?
-                    )
-                ''', (column_name,))
-                
-                affected_records = cursor.fetchall()
-                
-                for (record_id,) in affected_records:
-                    # Get remaining values for this record
-                    cursor.execute('''
-                        SELECT SUM(value_amount) 
-                        FROM record_values 
-                        WHERE daily_record_id = ?
-                    ''', (record_id,))
-                    
-                    new_total = cursor.fetchone()[0] or 0
-                    
-                    # Get FGTS for this record
-                    cursor.execute('SELECT fgts FROM daily_records WHERE id = ?', (record_id,))
-                    fgts = cursor.fetchone()[0] or 0
-                    
-                    new_total_with_fgts = new_total + fgts
-                    
-                    # Update totals
-                    cursor.execute('''
-                        UPDATE daily_records 
-                        SET total = ?, total_with_fgts = ?
-                        WHERE id = ?
-                    ''', (new_total, new_total_with_fgts, record_id))
-                
-                conn.commit()
-                return True
+            with self.transaction() as cursor:
+                self._journal(cursor, f"Exclusão da coluna '{column_name}'",
+                              self._delete_value_column(cursor, column_name))
+            return True
         except Exception as e:
             print(f"Error deleting column: {e}")
             return False
     
+    def _delete_value_column(self, cursor, column_name: str) -> List:
+        """Delete a value column from all records; returns the changes restoring it"""
+        cursor.execute('SELECT id, display_order FROM value_columns WHERE name = ?', (column_name,))
+        row = cursor.fetchone()
+        if row is None:
+            return []
+        column_id, display_order = row
+        cursor.execute('SELECT daily_record_id, value_amount, order_index FROM record_values WHERE value_column_id = ?',
+                       (column_id,))
+        values = [list(row) for row in cursor.fetchall()]
+        
+        # Recalculate totals of the records holding this value, without it
+        cursor.execute('''
+            UPDATE daily_records
+            SET total = remaining.total,
+                total_with_fgts = remaining.total + daily_records.fgts
+            FROM (
+                SELECT daily_record_id AS id,
+                       SUM(CASE WHEN value_column_id = ? THEN 0 ELSE value_amount END) AS total
+                FROM record_values
+                WHERE daily_record_id IN (SELECT daily_record_id FROM record_values WHERE value_column_id = ?)
+                GROUP BY daily_record_id
+            ) AS remaining
+            WHERE daily_records.id = remaining.id
+        ''', (column_id, column_id))
+        
+        # Delete all values with this name
+        cursor.execute('DELETE FROM record_values WHERE value_column_id = ?', (column_id,))
+        for _, value_table, _ in self.PERIOD_TABLES.values():
+            cursor.execute(f'DELETE FROM {value_table} WHERE value_column_id = ?', (column_id,))
+        cursor.execute('DELETE FROM value_columns WHERE id = ?', (column_id,))
+        
+        # Only the totals changed, so the sums of the other values stay
+        self._recompute_all_diffs(cursor)
+        self._rebuild_period_summaries(cursor, values=False)
+        return [['restore_value_column', {'name': column_name, 'display_order': display_order, 'values': values}]]
+    
+    def _restore_value_column(self, cursor, column: Dict) -> List:
+        """Put the values of a deleted column back into their records; returns the changes deleting it again"""
+        column_id = self._register_value_columns(cursor, [(column['name'], column['display_order'])])[column['name']]
+        cursor.executemany('''
+            INSERT INTO record_values (daily_record_id, value_column_id, value_amount, order_index)
+            VALUES (?, ?, ?, ?)
+        ''', [(record_id, column_id, amount, order_index) for record_id, amount, order_index in column['values']])
+        
+        # Recalculate totals of the records holding this value, with it
+        cursor.execute('''
+            UPDATE daily_records
+            SET total = restored.total,
+                total_with_fgts = restored.total + daily_records.fgts
+            FROM (
+                SELECT daily_record_id AS id, SUM(value_amount) AS total
+                FROM record_values
+                WHERE daily_record_id IN (SELECT daily_record_id FROM record_values WHERE value_column_id = ?)
+                GROUP BY daily_record_id
+            ) AS restored
+            WHERE daily_records.id = restored.id
+        ''', (column_id,))
+        
+        self._recompute_all_diffs(cursor)
+        self._rebuild_period_summaries(cursor, values=False)
+        self._summarize_value_columns(cursor, [column_id])
+        return [['delete_value_column', column['name']]]
+    
+    def _summarize_value_columns(self, cursor, column_ids: List[int]):
+        """Recompute the month and year sums of some value columns from their values"""
+        for _, value_table, length in self.PERIOD_TABLES.values():
+            cursor.executemany(f'DELETE FROM {value_table} WHERE value_column_id = ?',
+                               [(column_id,) for column_id in column_ids])
+            cursor.executemany(f'''
+                INSERT INTO {value_table} (period, value_column_id, amount)
+                SELECT substr(dr.date_key, 1, {length}) AS period, rv.value_column_id, SUM(rv.value_amount)
+                FROM record_values rv
+                JOIN daily_records dr ON dr.id = rv.daily_record_id
+                WHERE rv.value_column_id = ?
+                GROUP BY period, rv.value_column_id
+            ''', [(column_id,) for column_id in column_ids])
+    
     def create_value_column(self, column_name: str) -> bool:
         """Create a new value column (just validates the name doesn't exist)"""
         try:
@@ -242,10 +1029,199 @@ class DatabaseManager:
     def get_all_value_names(self) -> List[str]:
         """Get all unique value names from the database"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('SELECT DISTINCT value_name FROM record_values ORDER BY value_name')
-                return [row[0] for row in cursor.fetchall()]
+            cursor = self.get_connection().cursor()
+            cursor.execute('SELECT name FROM value_columns ORDER BY display_order, name')
+            return [row[0] for row in cursor.fetchall()]
         except Exception as e:
             print(f"Error getting value names: {e}")
-            return []
\ No newline at end of file
+            return []
+    
+    def _snapshot_records(self, cursor, dates: Iterable[str]) -> List[Dict]:
+        """Everything needed to write back the records of dates that exist
+        
+        Values are [name, amount, display_order, order_index] in record order. The
+        order index is kept because journaled column changes identify values by it.
+        """
+        snapshots = []
+        for date in dates:
+            cursor.execute('SELECT id, date, fgts, created_at FROM daily_records WHERE date_key = ?',
+                           (self.to_date_key(date),))
+            row = cursor.fetchone()
+            if row is None:
+                continue
+            cursor.execute('''
+                SELECT vc.name, rv.value_amount, vc.display_order, rv.order_index
+                FROM record_values rv
+                JOIN value_columns vc ON vc.id = rv.value_column_id
+                WHERE rv.daily_record_id = ?
+                ORDER BY rv.order_index
+            ''', (row[0],))
+            snapshots.append({'id': row[0], 'date': row[1], 'fgts': row[2], 'created_at': row[3],
+                              'values': [list(value) for value in cursor.fetchall()]})
+        return snapshots
+    
+    @staticmethod
+    def _restore_changes(snapshots: List[Dict], dates: List[str]) -> List:
+        """Changes bringing the days of dates back to snapshots, deleting those that had none"""
+        existing = {snapshot['date'] for snapshot in snapshots}
+        changes = []
+        new_dates = [date for date in dates if date not in existing]
+        if new_dates:
+            changes.append(['delete_records', new_dates])
+        if snapshots:
+            changes.append(['restore_records', snapshots])
+        return changes
+    
+    def _refresh_dates(self, cursor, date_keys: List[str]):
+        """Refresh the differences and summaries around days just written or deleted"""
+        if len(date_keys) > self.INCREMENTAL_REFRESH_DAYS:
+            self._recompute_all_diffs(cursor)
+            self._rebuild_period_summaries(cursor)
+            return
+        for date_key in sorted(date_keys):
+            self._refresh_diffs(cursor, date_key)
+            self._refresh_successor_diffs(cursor, date_key)
+            self._refresh_period_summaries(cursor, date_key)
+    
+    def _delete_records(self, cursor, dates: List[str]) -> List:
+        """Delete the records of dates; returns the changes restoring them"""
+        snapshots = self._snapshot_records(cursor, dates)
+        # CASCADE deletes their values
+        cursor.executemany('DELETE FROM daily_records WHERE id = ?', [(snapshot['id'],) for snapshot in snapshots])
+        self._prune_value_columns(cursor)
+        
+        # The following records are now compared against the deleted ones' predecessors
+        self._refresh_dates(cursor, [self.to_date_key(snapshot['date']) for snapshot in snapshots])
+        return [['restore_records', snapshots]] if snapshots else []
+    
+    def _restore_records(self, cursor, snapshots: List[Dict]) -> List:
+        """Write records back as snapshotted, with their IDs; returns the changes undoing it"""
+        # Changes journaled before dates were normalized may hold them as typed
+        dates = [self.normalize_date(snapshot['date']) for snapshot in snapshots]
+        previous = self._snapshot_records(cursor, dates)
+        
+        for date, snapshot in zip(dates, snapshots):
+            values = snapshot['values']
+            total = sum(value[1] for value in values)
+            cursor.execute('''
+                INSERT INTO daily_records (id, date, date_key, fgts, total, total_with_fgts, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (date_key) DO UPDATE SET
+                    date = excluded.date, fgts = excluded.fgts, total = excluded.total,
+                    total_with_fgts = excluded.total_with_fgts, created_at = excluded.created_at
+            ''', (snapshot['id'], date, self.to_date_key(date), snapshot['fgts'],
+                  total, total + snapshot['fgts'], snapshot['created_at']))
+            cursor.execute('SELECT id FROM daily_records WHERE date_key = ?', (self.to_date_key(date),))
+            record_id = cursor.fetchone()[0]
+            
+            cursor.execute('DELETE FROM record_values WHERE daily_record_id = ?', (record_id,))
+            column_ids = self._register_value_columns(cursor, [(name, display_order)
+                                                               for name, _, display_order, _ in values])
+            cursor.executemany('''
+                INSERT INTO record_values (daily_record_id, value_column_id, value_amount, order_index)
+                VALUES (?, ?, ?, ?)
+            ''', [(record_id, column_ids[name], amount, order_index) for name, amount, _, order_index in values])
+        self._prune_value_columns(cursor)
+        
+        self._refresh_dates(cursor, [self.to_date_key(date) for date in dates])
+        return self._restore_changes(previous, dates)
+    
+    def _journal(self, cursor, description: str, changes: List):
+        """Record the changes undoing a write, in the transaction of the write
+        
+        Changes already undone can no longer be redone once something else is written.
+        """
+        if not changes:
+            return
+        cursor.execute('DELETE FROM change_journal WHERE undone = 1')
+        cursor.execute('INSERT INTO change_journal (description, changes) VALUES (?, ?)',
+                       (description, json.dumps(changes)))
+        if cursor.lastrowid % self.JOURNAL_COMPACT_INTERVAL == 0:
+            self._compact_journal(cursor, self.JOURNAL_SIZE)
+    
+    def _apply_changes(self, cursor, changes: List) -> List:
+        """Apply journaled changes in order; returns the changes reverting them"""
+        actions = {
+            'delete_records': self._delete_records,
+            'restore_records': self._restore_records,
+            'rename_value_column': self._rename_value_column,
+            'split_value_column': self._split_value_column,
+            'delete_value_column': self._delete_value_column,
+            'restore_value_column': self._restore_value_column,
+        }
+        inverse = []
+        for action, argument in changes:
+            inverse[:0] = actions[action](cursor, argument) or []
+        return inverse
+    
+    def _replay(self, undo: bool) -> Tuple[bool, str]:
+        """Undo the latest change still applied, or redo the latest one undone"""
+        try:
+            with self.transaction() as cursor:
+                # Undone changes are redone from the most recently undone one, which has the lowest ID
+                cursor.execute(f'''
+                    SELECT id, description, changes FROM change_journal
+                    WHERE undone = ? ORDER BY id {'DESC' if undo else 'ASC'} LIMIT 1
+                ''', (0 if undo else 1,))
+                row = cursor.fetchone()
+                if row is None:
+                    return False, "Nada para desfazer" if undo else "Nada para refazer"
+                
+                changes = json.loads(row[2])
+                inverse = self._apply_changes(cursor, changes)
+                cursor.execute('UPDATE change_journal SET changes = ?, undone = ? WHERE id = ?',
+                               (json.dumps(inverse), int(undo), row[0]))
+            
+            # Records already built show renamed values under their new name too
+            for action, argument in changes:
+                if action == 'rename_value_column':
+                    self.value_names.rename(*argument)
+            return True, row[1]
+        except Exception as e:
+            print(f"Error replaying change: {e}")
+            return False, str(e)
+    
+    def undo(self) -> Tuple[bool, str]:
+        """Revert the latest journaled write
+        
+        Returns (success, description of the change or error).
+        """
+        return self._replay(undo=True)
+    
+    def redo(self) -> Tuple[bool, str]:
+        """Apply again the latest write reverted by undo
+        
+        Returns (success, description of the change or error).
+        """
+        return self._replay(undo=False)
+    
+    def get_undo_description(self) -> Optional[str]:
+        """Description of the change undo would revert, if any"""
+        cursor = self.get_connection().cursor()
+        cursor.execute('SELECT description FROM change_journal WHERE undone = 0 ORDER BY id DESC LIMIT 1')
+        row = cursor.fetchone()
+        return row[0] if row else None
+    
+    def get_redo_description(self) -> Optional[str]:
+        """Description of the change redo would apply again, if any"""
+        cursor = self.get_connection().cursor()
+        cursor.execute('SELECT description FROM change_journal WHERE undone = 1 ORDER BY id ASC LIMIT 1')
+        row = cursor.fetchone()
+        return row[0] if row else None
+    
+    def _compact_journal(self, cursor, keep: int):
+        """Forget all but the latest keep changes"""
+        cursor.execute('''
+            DELETE FROM change_journal
+            WHERE id NOT IN (SELECT id FROM change_journal ORDER BY id DESC LIMIT ?)
+        ''', (keep,))
+    
+    def compact_journal(self, keep: Optional[int] = None) -> bool:
+        """Trim the change journal to its latest keep (default JOURNAL_SIZE) changes"""
+        try:
+            with self.transaction() as cursor:
+                self._compact_journal(cursor, self.JOURNAL_SIZE if keep is None else keep)
+            return True
+        except Exception as e:
+            print(f"Error compacting journal: {e}")
+            return False
@@ -0,0 +1,153 @@
+"""
+In-process cache of decoded records sitting between the GUI and DatabaseManager
+"""
+import threading
+from typing import List, Tuple
+
+class RecordCache:
+    """Read-through cache with write-through invalidation
+    
+    Exposes the same interface as DatabaseManager. Read results are kept until
+    the next write, so repeated reads during one UI cycle cost nothing. Writes
+    made through the cache patch the cached data where that is cheap, and any
+    other committed transaction (detected through DatabaseManager.generation)
+    drops the whole cache. Reads with an offset (pages of the history) are
+    not kept. Returned lists are shared and must be treated as read-only.
+    """
+    
+    # Read methods whose results are cached, keyed by their arguments
+    CACHED_READS = (
+        'get_all_records', 'get_records', 'get_record_summaries', 'count_records',
+        'get_latest_record', 'get_last_record', 'get_record_by_date', 'get_all_value_names',
+        'get_adjacent_record', 'get_summary_columns', 'get_period_summaries', 'get_period_value_sums',
+    )
+    
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+        self._lock = threading.RLock()
+        self._entries = {}
+        self._generation = db_manager.generation
+    
+    def __getattr__(self, name):
+        # Only called for attributes not defined on the cache itself
+        attribute = getattr(self.db_manager, name)
+        if name in self.CACHED_READS:
+            return lambda *args, **kwargs: self._read(name, attribute, args, kwargs)
+        return attribute
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def _read(self, name, method, args, kwargs):
+        """Return a cached result, loading it from the database on a miss"""
+        if kwargs.get('offset'):
+            # Pages deep into the history would pile up until the next write;
+            # the records table keeps a bounded cache of its own pages
+            return method(*args, **kwargs)
+        key = (name, args, tuple(sorted(kwargs.items())))
+        with self._lock:
+            self._sync()
+            if key in self._entries:
+                return self._entries[key]
+            generation = self._generation
+        
+        # Queried without the lock, so a slow read on a worker does not hold up the Tk thread
+        result = method(*args, **kwargs)
+        with self._lock:
+            self._sync()
+            # A write committed during the query may have made the result stale
+            if self._generation == generation:
+                result = self._entries.setdefault(key, result)
+        return result
+    
+    def _sync(self):
+        """Drop everything if a write happened that the cache did not see"""
+        generation = self.db_manager.generation
+        if self._generation != generation:
+            self._entries.clear()
+            self._generation = generation
+    
+    def _value_names_key(self):
+        return ('get_all_value_names', (), ())
+    
+    def invalidate(self):
+        """Forget every cached result"""
+        with self._lock:
+            self._entries.clear()
+            self._generation = self.db_manager.generation
+    
+    def _write_started(self):
+        """Generation and cached value names before a write, taken under the lock"""
+        with self._lock:
+            self._sync()
+            return self._generation, self._entries.get(self._value_names_key())
+    
+    def _only_write_since(self, generation) -> bool:
+        """Whether the database saw exactly one write (the caller's) since generation"""
+        return self.db_manager.generation == generation + 1
+    
+    def insert_record(self, date: str, values: List[Tuple[str, float]], fgts: float) -> bool:
+        """Insert through the database, extending the cached value names
+        
+        The write runs without the lock, so cached reads on other threads are
+        not held up by it.
+        """
+        generation, names = self._write_started()
+        # Replacing an existing day may drop names, so only a new day can be patched
+        is_new_day = self.db_manager.count_records(date, date) == 0
+        success = self.db_manager.insert_record(date, values, fgts)
+        with self._lock:
+            patch = success and is_new_day and names is not None and self._only_write_since(generation)
+            self.invalidate()
+            if patch:
+                # New names are listed after the existing ones, in the order given
+                self._entries[self._value_names_key()] = list(dict.fromkeys(names + [name for name, _ in values]))
+            return success
+    
+    def delete_record(self, record_id: int) -> bool:
+        """Delete through the database and drop the cache"""
+        success = self.db_manager.delete_record(record_id)
+        self.invalidate()
+        return success
+    
+    def rename_value_column(self, old_name: str, new_name: str) -> bool:
+        """Rename through the database, keeping the cached records
+        
+        Records read their value names from the database's shared
+        ValueNameIndex, which the rename updates, so they stay valid as they are.
+        """
+        generation, names = self._write_started()
+        success = self.db_manager.rename_value_column(old_name, new_name)
+        with self._lock:
+            # Entries read before another write, or missing a failed rename's changes, cannot be kept
+            if not success or not self._only_write_since(generation) or self._generation != generation:
+                self.invalidate()
+                return success
+            
+            if names is not None:
+                if new_name in names and new_name != old_name:
+                    # Renaming onto an existing name merges both columns
+                    names = [name for name in names if name != old_name]
+                else:
+                    names = [new_name if name == old_name else name for name in names]
+                self._entries[self._value_names_key()] = names
+            # Per-value sums are keyed by name, and merged ones changed
+            for key in [key for key in self._entries if key[0] == 'get_period_value_sums']:
+                del self._entries[key]
+            self._generation = self.db_manager.generation
+            return success
+    
+    def delete_value_column(self, column_name: str) -> bool:
+        """Delete through the database, keeping the cached value names"""
+        generation, names = self._write_started()
+        success = self.db_manager.delete_value_column(column_name)
+        with self._lock:
+            patch = success and names is not None and self._only_write_since(generation)
+            # Totals and diffs of every record changed, so records must be reloaded
+            self.invalidate()
+            if patch:
+                self._entries[self._value_names_key()] = [name for name in names if name != column_name]
+            return success
@@ -3,27 +3,46 @@ Financial charts and data visualization components
 """
 import tkinter as tk
 from tkinter import ttk
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+import matplotlib
+import matplotlib.style
 from matplotlib.figure import Figure
+from matplotlib.ticker import FuncFormatter
 import matplotlib.dates as mdates
-from datetime import datetime
 import numpy as np
+from gui.decimation import decimate
+from utils.formatting import format_compact_currency
 
 class FinancialCharts:
     """Financial data visualization components"""
     
+    # Colors of the breakdown pie wedges
+    PIE_COLORS = ['#9d4edd', '#f72585', '#4cc9f0', '#7209b7']
+    
+    # Months shown by the growth chart
+    GROWTH_CHART_MONTHS = 24
+    
+    # Longest series still drawn with point markers
+    MARKER_LIMIT = 100
+    
+    # Date label format by spacing between ticks, in days
+    DATE_FORMATS = {mdates.DAYS_PER_YEAR: '%Y', mdates.DAYS_PER_MONTH: '%m/%Y', 1.0: '%d/%m/%Y'}
+    
     def __init__(self, parent, theme_colors):
         self.parent = parent
         self.colors = theme_colors
+        self.pie_colors = [self.colors['accent'], self.colors['success'], self.colors['warning'],
+                           self.colors['error']] + self.PIE_COLORS
+        # Persistent figure, canvas and chart kind per parent frame
+        self._charts = {}
+        self._loading_labels = {}
         self.setup_matplotlib_style()
     
     def setup_matplotlib_style(self):
         """Configure matplotlib for dark theme"""
-        plt.style.use('dark_background')
+        matplotlib.style.use('dark_background')
         
         # Set default colors
-        plt.rcParams.update({
+        matplotlib.rcParams.update({
             'figure.facecolor': self.colors['bg_primary'],
             'axes.facecolor': self.colors['bg_secondary'],
             'axes.edgecolor': self.colors['border'],
@@ -37,37 +56,22 @@ class FinancialCharts:
             'font.family': 'Segoe UI'
         })
     
-    def create_evolution_chart(self, records_data):
-        """Create total evolution line chart"""
-        if not records_data:
+    def create_evolution_chart(self, series):
+        """Create total evolution line chart from prepare_series arrays"""
+        if not len(series['dates']):
             return self.create_empty_chart("Nenhum dado disponível")
         
-        # Prepare data
-        dates = []
-        totals = []
-        totals_with_fgts = []
-        
-        for record in reversed(records_data):  # Reverse to get chronological order
-            try:
-                date = datetime.strptime(record['date'], '%d/%m/%Y')
-                dates.append(date)
-                totals.append(record['total'])
-                totals_with_fgts.append(record['total_with_fgts'])
-            except ValueError:
-                continue
-        
-        if not dates:
-            return self.create_empty_chart("Dados de data inválidos")
-        
         # Create figure
         fig = Figure(figsize=(10, 6), facecolor=self.colors['bg_primary'])
         ax = fig.add_subplot(111)
         
-        # Plot lines
-        ax.plot(dates, totals, color=self.colors['accent'], linewidth=2.5, 
-               label='Total', marker='o', markersize=4)
-        ax.plot(dates, totals_with_fgts, color=self.colors['success'], linewidth=2.5, 
-               label='Total + FGTS', marker='s', markersize=4)
+        # Plot lines, reduced to about one point per pixel
+        (x, totals), (x_with_fgts, totals_with_fgts) = self.decimated_evolution(fig, series)
+        show_markers = len(series['dates']) <= self.MARKER_LIMIT
+        ax.plot(x, totals, color=self.colors['accent'], linewidth=2.5, 
+               label='Total', marker='o' if show_markers else '', markersize=4)
+        ax.plot(x_with_fgts, totals_with_fgts, color=self.colors['success'], linewidth=2.5, 
+               label='Total + FGTS', marker='s' if show_markers else '', markersize=4)
         
         # Customize chart
         ax.set_title('Evolução Financeira', fontsize=14, fontweight='bold', 
@@ -76,49 +80,98 @@ class FinancialCharts:
         ax.set_ylabel('Valor (R$)', fontsize=10, color=self.colors['text_secondary'])
         
         # Format y-axis as currency
-        ax.yaxis.set_major_formatter(plt.FuncFormatter(self.format_currency))
+        ax.yaxis.set_major_formatter(FuncFormatter(self.format_currency))
         
-        # Format x-axis dates
-        ax.xaxis.set_major_formatter(mdates.DateFormatter('%m/%Y'))
-        ax.xaxis.set_major_locator(mdates.MonthLocator(interval=1))
+        # Format x-axis dates with a tick spacing that suits the date range
+        ax.xaxis_date()
+        self.format_date_axis(ax)
         
         # Grid and legend
         ax.grid(True, alpha=0.3)
         ax.legend(loc='upper left', frameon=True, fancybox=True, shadow=True)
         
         # Rotate x-axis labels
-        plt.setp(ax.xaxis.get_majorticklabels(), rotation=45)
+        ax.tick_params(axis='x', labelrotation=45)
+        
+        fig.tight_layout()
+        return fig
+    
+    def create_projection_chart(self, forecast):
+        """Create history and projected totals line chart from TrendForecaster.forecast"""
+        if forecast is None:
+            return self.create_empty_chart("Dados insuficientes para projeção")
+        
+        # Create figure
+        fig = Figure(figsize=(10, 6), facecolor=self.colors['bg_primary'])
+        ax = fig.add_subplot(111)
+        
+        # History lines, then projections drawn dashed from the last record
+        (x, totals), (x_with_fgts, totals_with_fgts) = self.decimated_evolution(fig, forecast)
+        ax.plot(x, totals, color=self.colors['accent'], linewidth=2, label='Total')
+        ax.plot(x_with_fgts, totals_with_fgts, color=self.colors['success'], linewidth=2, label='Total + FGTS')
+        (x, totals), (x_with_fgts, totals_with_fgts) = self.projection_lines(forecast)
+        ax.plot(x, totals, color=self.colors['accent'], linewidth=2, linestyle='--', label='Projeção Total')
+        ax.plot(x_with_fgts, totals_with_fgts, color=self.colors['success'], linewidth=2, linestyle='--',
+               label='Projeção Total + FGTS')
+        
+        # Customize chart
+        ax.set_title('Projeção Financeira', fontsize=14, fontweight='bold', 
+                    color=self.colors['text_primary'], pad=20)
+        ax.set_xlabel('Data', fontsize=10, color=self.colors['text_secondary'])
+        ax.set_ylabel('Valor (R$)', fontsize=10, color=self.colors['text_secondary'])
+        ax.yaxis.set_major_formatter(FuncFormatter(self.format_currency))
+        ax.xaxis_date()
+        self.format_date_axis(ax)
+        
+        # Grid and legend
+        ax.grid(True, alpha=0.3)
+        ax.legend(loc='upper left', frameon=True, fancybox=True, shadow=True)
+        ax.tick_params(axis='x', labelrotation=45)
         
         fig.tight_layout()
         return fig
     
+    def projection_lines(self, forecast):
+        """Projected points of both totals, starting at the last recorded one"""
+        x = np.concatenate((mdates.date2num(forecast['dates'][-1:]), mdates.date2num(forecast['forecast_dates'])))
+        return ((x, np.concatenate((forecast['totals'][-1:], forecast['forecast']['total']))),
+                (x, np.concatenate((forecast['totals_with_fgts'][-1:], forecast['forecast']['total_with_fgts']))))
+    
     def create_values_breakdown_chart(self, records_data):
         """Create pie chart showing breakdown of latest values"""
+        return self.breakdown_figure(records_data)[0]
+    
+    def breakdown_figure(self, records_data):
+        """Create the breakdown pie figure and its (wedges, texts, autotexts), None when empty"""
         if not records_data:
-            return self.create_empty_chart("Nenhum dado disponível")
+            return self.create_empty_chart("Nenhum dado disponível"), None
         
         # Get latest record
         latest_record = records_data[0]
         values = latest_record.get('values', [])
         
         if not values:
-            return self.create_empty_chart("Nenhum valor encontrado")
-        
-        # Prepare data
-        labels = [v['name'] for v in values]
-        sizes = [v['amount'] for v in values]
+            return self.create_empty_chart("Nenhum valor encontrado"), None
         
         # Create figure
         fig = Figure(figsize=(8, 6), facecolor=self.colors['bg_primary'])
         ax = fig.add_subplot(111)
+        pie = self.draw_breakdown_pie(ax, latest_record)
+        
+        fig.tight_layout()
+        return fig, pie
+    
+    def draw_breakdown_pie(self, ax, latest_record):
+        """Draw the breakdown pie of a record on an axes; returns its (wedges, texts, autotexts)"""
+        values = latest_record['values']
         
-        # Create color palette
-        colors = [self.colors['accent'], self.colors['success'], self.colors['warning'], 
-                 self.colors['error'], '#9d4edd', '#f72585', '#4cc9f0', '#7209b7']
+        # Prepare data
+        labels = [v['name'] for v in values]
+        sizes = [v['amount'] for v in values]
         
         # Create pie chart
         wedges, texts, autotexts = ax.pie(sizes, labels=labels, autopct='%1.1f%%',
-                                         colors=colors[:len(labels)], startangle=90,
+                                         colors=self.pie_colors[:len(labels)], startangle=90,
                                          textprops={'color': self.colors['text_primary']})
         
         # Customize
@@ -129,49 +182,19 @@ class FinancialCharts:
         for autotext in autotexts:
             autotext.set_color('white')
             autotext.set_fontweight('bold')
-        
-        fig.tight_layout()
-        return fig
+        return wedges, texts, autotexts
     
-    def create_growth_chart(self, records_data):
-        """Create bar chart showing month-over-month growth"""
-        if len(records_data) < 2:
+    def create_growth_chart(self, growth):
+        """Create bar chart showing month-over-month growth from prepare_growth_series arrays"""
+        if not len(growth['labels']):
             return self.create_empty_chart("Dados insuficientes para análise de crescimento")
         
-        # Prepare data
-        dates = []
-        growth_values = []
-        growth_percentages = []
-        
-        for record in reversed(records_data):  # Reverse to get chronological order
-            try:
-                date = datetime.strptime(record['date'], '%d/%m/%Y')
-                dates.append(date.strftime('%m/%Y'))
-                growth_values.append(record['real_increase'])
-                growth_percentages.append(record['percentage_diff'])
-            except ValueError:
-                continue
-        
-        if len(dates) < 2:
-            return self.create_empty_chart("Dados insuficientes")
-        
         # Create figure
         fig = Figure(figsize=(10, 6), facecolor=self.colors['bg_primary'])
         ax = fig.add_subplot(111)
         
-        # Create bars with colors based on positive/negative growth
-        colors = [self.colors['success'] if val >= 0 else self.colors['error'] 
-                 for val in growth_values[1:]]  # Skip first value (no previous data)
-        
-        bars = ax.bar(dates[1:], growth_values[1:], color=colors, alpha=0.8)
-        
-        # Add value labels on bars
-        for bar, percentage in zip(bars, growth_percentages[1:]):
-            height = bar.get_height()
-            ax.text(bar.get_x() + bar.get_width()/2., height,
-                   f'{percentage:.1f}%',
-                   ha='center', va='bottom' if height >= 0 else 'top',
-                   color=self.colors['text_primary'], fontweight='bold')
+        self.draw_growth_bars(ax, growth['labels'], growth['growth_values'], growth['growth_percentages'],
+                              growth['growth_positive'])
         
         # Customize chart
         ax.set_title('Crescimento Mensal', fontsize=14, fontweight='bold', 
@@ -180,7 +203,7 @@ class FinancialCharts:
         ax.set_ylabel('Variação (R$)', fontsize=10, color=self.colors['text_secondary'])
         
         # Format y-axis as currency
-        ax.yaxis.set_major_formatter(plt.FuncFormatter(self.format_currency))
+        ax.yaxis.set_major_formatter(FuncFormatter(self.format_currency))
         
         # Add horizontal line at zero
         ax.axhline(y=0, color=self.colors['border'], linestyle='-', alpha=0.5)
@@ -189,11 +212,76 @@ class FinancialCharts:
         ax.grid(True, alpha=0.3, axis='y')
         
         # Rotate x-axis labels
-        plt.setp(ax.xaxis.get_majorticklabels(), rotation=45)
+        ax.tick_params(axis='x', labelrotation=45)
         
         fig.tight_layout()
         return fig
     
+    def draw_growth_bars(self, ax, labels, growth_values, growth_percentages, positive):
+        """Draw growth bars and their percentage labels on an axes"""
+        # Create bars with colors based on positive/negative growth
+        bars = ax.bar(labels, growth_values, color=self.growth_colors(positive), alpha=0.8)
+        
+        # Add value labels on bars
+        for bar, percentage in zip(bars, growth_percentages):
+            height = bar.get_height()
+            ax.text(bar.get_x() + bar.get_width()/2., height,
+                   f'{percentage:.1f}%',
+                   ha='center', va='bottom' if height >= 0 else 'top',
+                   color=self.colors['text_primary'], fontweight='bold')
+        return bars
+    
+    def prepare_series(self, columns):
+        """Turn get_summary_columns output into the chronological arrays the charts draw
+        
+        Dates become datetime64 and amounts float64 (missing ones NaN), so every
+        later step works on whole arrays instead of looping over records.
+        """
+        dates = np.array(columns['date_key'], dtype='datetime64[D]')
+        valid = ~np.isnat(dates)
+        return {
+            'dates': dates[valid],
+            'totals': np.array(columns['total'], dtype=np.float64)[valid],
+            'totals_with_fgts': np.array(columns['total_with_fgts'], dtype=np.float64)[valid],
+        }
+    
+    def prepare_growth_series(self, columns):
+        """Turn monthly get_period_summaries output into the arrays of the growth bars
+        
+        Only the last GROWTH_CHART_MONTHS months with a previous month to grow
+        from are kept.
+        """
+        growth_values = np.array(columns['growth'], dtype=np.float64)
+        keep = np.flatnonzero(~np.isnan(growth_values))[-self.GROWTH_CHART_MONTHS:]
+        growth_values = growth_values[keep]
+        
+        # Periods are YYYY-MM; the axis shows MM/YYYY
+        periods = [columns['period'][i] for i in keep]
+        return {
+            'labels': np.array([f'{period[5:]}/{period[:4]}' for period in periods], dtype=str),
+            'growth_values': growth_values,
+            'growth_percentages': np.array(columns['growth_percentage'], dtype=np.float64)[keep],
+            'growth_positive': growth_values >= 0,
+        }
+    
+    def decimated_evolution(self, figure, series):
+        """Evolution lines downsampled to about the pixel width of the figure"""
+        x = mdates.date2num(series['dates'])
+        max_points = int(figure.get_figwidth() * figure.dpi)
+        return (decimate(x, series['totals'], max_points),
+                decimate(x, series['totals_with_fgts'], max_points))
+    
+    def format_date_axis(self, ax):
+        """Use a date locator that keeps the tick count bounded for any date range"""
+        locator = mdates.AutoDateLocator(minticks=3, maxticks=10)
+        formatter = mdates.AutoDateFormatter(locator, defaultfmt='%d/%m/%Y')
+        formatter.scaled = dict(self.DATE_FORMATS)
+        ax.xaxis.set_major_locator(locator)
+        ax.xaxis.set_major_formatter(formatter)
+    
+    def growth_colors(self, positive):
+        return np.where(positive, self.colors['success'], self.colors['error'])
+    
     def create_empty_chart(self, message):
         """Create empty chart with message"""
         fig = Figure(figsize=(8, 6), facecolor=self.colors['bg_primary'])
@@ -210,19 +298,159 @@ class FinancialCharts:
         return fig
     
     def format_currency(self, x, pos):
-        """Format number as Brazilian currency"""
-        if x >= 1000000:
-            return f'R$ {x/1000000:.1f}M'
-        elif x >= 1000:
-            return f'R$ {x/1000:.1f}K'
+        """Format an axis tick as abbreviated Brazilian currency"""
+        return format_compact_currency(x)
+    
+    def render_evolution_chart(self, parent_frame, series):
+        """Show the evolution chart, updating the existing lines in place"""
+        state = self._charts.get(parent_frame)
+        has_data = len(series['dates']) > 0
+        
+        if state is None or state['kind'] != 'evolution' or not has_data:
+            self.show_figure(parent_frame, 'evolution' if has_data else 'empty',
+                             self.create_evolution_chart(series))
+            return
+        
+        ax = state['figure'].axes[0]
+        total_line, total_with_fgts_line = ax.get_lines()[:2]
+        total_points, total_with_fgts_points = self.decimated_evolution(state['figure'], series)
+        show_markers = len(series['dates']) <= self.MARKER_LIMIT
+        total_line.set_data(*total_points)
+        total_line.set_marker('o' if show_markers else '')
+        total_with_fgts_line.set_data(*total_with_fgts_points)
+        total_with_fgts_line.set_marker('s' if show_markers else '')
+        ax.relim()
+        ax.autoscale_view()
+        self.redraw(parent_frame)
+    
+    def render_projection_chart(self, parent_frame, forecast):
+        """Show the projection chart, updating the existing lines in place"""
+        state = self._charts.get(parent_frame)
+        
+        if state is None or state['kind'] != 'projection' or forecast is None:
+            self.show_figure(parent_frame, 'projection' if forecast is not None else 'empty',
+                             self.create_projection_chart(forecast))
+            return
+        
+        ax = state['figure'].axes[0]
+        points = self.decimated_evolution(state['figure'], forecast) + self.projection_lines(forecast)
+        for line, (x, y) in zip(ax.get_lines(), points):
+            line.set_data(x, y)
+        ax.relim()
+        ax.autoscale_view()
+        self.redraw(parent_frame)
+    
+    def render_breakdown_chart(self, parent_frame, records_data):
+        """Show the breakdown pie, moving the existing wedges in place"""
+        state = self._charts.get(parent_frame)
+        latest_record = records_data[0] if records_data else None
+        values = latest_record.get('values', []) if latest_record else []
+        
+        if state is None or state['kind'] != 'breakdown' or not values:
+            figure, pie = self.breakdown_figure(records_data)
+            self.show_figure(parent_frame, 'breakdown' if values else 'empty', figure)
+            self._charts[parent_frame]['pie'] = pie
+            return
+        
+        ax = state['figure'].axes[0]
+        wedges, texts, autotexts = state['pie']
+        labels = [v['name'] for v in values]
+        sizes = [v['amount'] for v in values]
+        total = sum(sizes)
+        
+        if labels != [text.get_text() for text in texts] or total <= 0:
+            # Different slices: redraw the pie on the same axes
+            ax.clear()
+            state['pie'] = self.draw_breakdown_pie(ax, latest_record)
+        else:
+            # Same slices: move wedges and their labels like ax.pie(startangle=90) would
+            theta = 90.0
+            for wedge, label, autotext, size in zip(wedges, texts, autotexts, sizes):
+                span = 360.0 * size / total
+                wedge.set_theta1(theta)
+                wedge.set_theta2(theta + span)
+                middle = np.deg2rad(theta + span / 2)
+                label.set_position((1.1 * np.cos(middle), 1.1 * np.sin(middle)))
+                label.set_horizontalalignment('left' if np.cos(middle) > 0 else 'right')
+                autotext.set_position((0.6 * np.cos(middle), 0.6 * np.sin(middle)))
+                autotext.set_text(f'{100.0 * size / total:.1f}%')
+                theta += span
+            ax.title.set_text(f'Composição de Valores - {latest_record["date"]}')
+        self.redraw(parent_frame)
+    
+    def render_growth_chart(self, parent_frame, growth):
+        """Show the growth chart, changing the existing bar heights in place"""
+        state = self._charts.get(parent_frame)
+        labels = growth['labels'].tolist()
+        
+        # Bars sit on a categorical axis, so a different set of months needs a new figure
+        if state is None or state['kind'] != 'growth' or state.get('labels') != labels:
+            self.show_figure(parent_frame, 'growth' if labels else 'empty', self.create_growth_chart(growth))
+            self._charts[parent_frame]['labels'] = labels
+            return
+        
+        ax = state['figure'].axes[0]
+        colors = self.growth_colors(growth['growth_positive'])
+        for bar, text, value, percentage, color, is_positive in zip(
+                ax.containers[0], ax.texts, growth['growth_values'], growth['growth_percentages'], colors,
+                growth['growth_positive']):
+            bar.set_height(value)
+            bar.set_color(color)
+            text.set_position((bar.get_x() + bar.get_width() / 2., value))
+            text.set_verticalalignment('bottom' if is_positive else 'top')
+            text.set_text(f'{percentage:.1f}%')
+        ax.relim()
+        ax.autoscale_view()
+        self.redraw(parent_frame)
+    
+    def show_figure(self, parent_frame, kind, figure):
+        """Show a new figure in a frame, reusing the frame's canvas if it has one"""
+        state = self._charts.get(parent_frame)
+        if state is None:
+            canvas = self.embed_chart(parent_frame, figure)
         else:
-            return f'R$ {x:.0f}'
+            canvas = state['canvas']
+            canvas.figure = figure
+            figure.set_canvas(canvas)
+            # Match the new figure to the widget's current size
+            widget = canvas.get_tk_widget()
+            width, height = widget.winfo_width(), widget.winfo_height()
+            if width > 1 and height > 1:
+                figure.set_size_inches(width / figure.dpi, height / figure.dpi, forward=False)
+        
+        self._charts[parent_frame] = {'kind': kind, 'figure': figure, 'canvas': canvas}
+        self.redraw(parent_frame)
+    
+    def redraw(self, parent_frame):
+        """Schedule a redraw of a frame's chart and drop its loading message"""
+        label = self._loading_labels.pop(parent_frame, None)
+        if label is not None:
+            label.destroy()
+        self._charts[parent_frame]['canvas'].draw_idle()
+    
+    def show_loading(self, parent_frame, message="Carregando..."):
+        """Show a loading message over a chart frame until its next render"""
+        if parent_frame in self._loading_labels:
+            return
+        
+        label = tk.Label(parent_frame, text=message, bg=self.colors['bg_primary'],
+                         fg=self.colors['text_muted'], font=('Segoe UI', 12), height=10)
+        if parent_frame in self._charts:
+            # Overlay the existing canvas instead of tearing it down
+            label.place(relx=0.5, rely=0.5, anchor=tk.CENTER)
+        else:
+            label.pack(fill=tk.BOTH, expand=True)
+        self._loading_labels[parent_frame] = label
     
     def embed_chart(self, parent_frame, figure):
         """Embed matplotlib figure in tkinter frame"""
         # Clear existing widgets
         for widget in parent_frame.winfo_children():
             widget.destroy()
+        self._loading_labels.pop(parent_frame, None)
+        
+        # The Tk backend is only needed once a chart is actually shown
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
         
         # Create canvas
         canvas = FigureCanvasTkAgg(figure, parent_frame)
@@ -0,0 +1,93 @@
+"""
+Diagnostics window showing what the instrumentation measured
+"""
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox
+
+class DiagnosticsPanel:
+    """Table of timed operations and list of redundant calls, refreshed on demand"""
+    
+    COLUMNS = ('Operação', 'Chamadas', 'Total (ms)', 'Média (ms)', 'Máx (ms)', 'Linhas', 'Redundantes')
+    
+    def __init__(self, root, instrumentation):
+        self.instrumentation = instrumentation
+        
+        self.window = tk.Toplevel(root)
+        self.window.title("Diagnóstico de Desempenho")
+        self.window.geometry("1000x600")
+        self.window.transient(root)
+        
+        main_frame = ttk.Frame(self.window, padding="15")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+        
+        # Operations, slowest total first
+        operations_frame = ttk.LabelFrame(main_frame, text="Operações", padding="10")
+        operations_frame.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
+        
+        self.operations_tree = ttk.Treeview(operations_frame, columns=self.COLUMNS, show='headings', height=14)
+        for col in self.COLUMNS:
+            self.operations_tree.heading(col, text=col)
+            self.operations_tree.column(col, width=90, minwidth=70, anchor=tk.E)
+        self.operations_tree.column('Operação', width=360, anchor=tk.W)
+        
+        scrollbar = ttk.Scrollbar(operations_frame, orient=tk.VERTICAL, command=self.operations_tree.yview)
+        self.operations_tree.configure(yscrollcommand=scrollbar.set)
+        self.operations_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        # Latest redundant calls
+        redundant_frame = ttk.LabelFrame(main_frame, text="Chamadas Redundantes Recentes", padding="10")
+        redundant_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        self.redundant_listbox = tk.Listbox(redundant_frame, height=6)
+        self.redundant_listbox.pack(fill=tk.X)
+        
+        # Actions
+        buttons_frame = ttk.Frame(main_frame)
+        buttons_frame.pack(fill=tk.X)
+        
+        ttk.Button(buttons_frame, text="Atualizar", command=self.refresh).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(buttons_frame, text="Limpar", command=self.clear).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(buttons_frame, text="Exportar JSON", command=self.export).pack(side=tk.LEFT)
+        ttk.Button(buttons_frame, text="Fechar", command=self.window.destroy).pack(side=tk.RIGHT)
+        
+        self.refresh()
+    
+    def refresh(self):
+        """Show the current statistics"""
+        snapshot = self.instrumentation.snapshot()
+        
+        self.operations_tree.delete(*self.operations_tree.get_children())
+        for name, stats in snapshot['operations'].items():
+            self.operations_tree.insert('', tk.END, values=(
+                name,
+                stats['calls'],
+                f"{stats['seconds'] * 1000:.1f}",
+                f"{stats['mean_seconds'] * 1000:.2f}",
+                f"{stats['max_seconds'] * 1000:.1f}",
+                stats['rows'],
+                stats['redundant_calls'],
+            ))
+        
+        self.redundant_listbox.delete(0, tk.END)
+        for call in reversed(snapshot['redundant_calls']):
+            self.redundant_listbox.insert(
+                tk.END, f"{call['at']:.1f}s  {call['name']}{call['arguments']}  "
+                        f"(repetida após {call['seconds_since_previous'] * 1000:.0f} ms)")
+    
+    def clear(self):
+        """Start measuring from scratch"""
+        self.instrumentation.reset()
+        self.refresh()
+    
+    def export(self):
+        """Save the statistics and latest spans to a JSON file"""
+        path = filedialog.asksaveasfilename(parent=self.window, title="Exportar diagnóstico",
+                                            defaultextension='.json', filetypes=[("JSON", "*.json")])
+        if not path:
+            return
+        try:
+            self.instrumentation.dump(path)
+            messagebox.showinfo("Sucesso", f"Diagnóstico exportado para '{path}'", parent=self.window)
+        except OSError as e:
+            messagebox.showerror("Erro", f"Erro ao exportar diagnóstico: {e}", parent=self.window)
@@ -1,34 +1,75 @@
+import importlib
+import math
 import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import datetime
 from database.db_manager import DatabaseManager
-from models.financial_record import FinancialRecord
+from database.record_cache import RecordCache
 from utils.validators import Validators
+from utils.formatting import format_currency, format_percentage
 from gui.theme import DarkTheme
-from gui.charts import FinancialCharts
+from gui.virtual_table import VirtualRecordTable
+from gui.task_runner import BackgroundTaskRunner
 
 class MainWindow:
-    def __init__(self):
+    # Records averaged by the analytics rolling mean
+    ROLLING_WINDOW = 30
+    
+    # Projection methods offered in the analytics tab, by label
+    FORECAST_METHODS = {'Linear': 'linear', 'Exponencial': 'exponential', 'Holt-Winters': 'holt_winters'}
+    
+    # Months projected past the last record
+    FORECAST_MONTHS = 12
+    
+    # Background task key refreshing each tab, by a fragment of the tab label
+    TAB_TASKS = {'📊 Dashboard': 'dashboard', '📋 Registros': 'records', '📈 Análises': 'analytics'}
+    
+    # Refresh paths timed when instrumentation is on: worker-thread loads and Tk rendering
+    INSTRUMENTED_METHODS = ('load_records', 'show_records', 'refresh_dashboard', 'build_dashboard',
+                            'show_dashboard', 'update_header_stats', 'load_header_stats', 'render_header_stats',
+                            'refresh_analytics', 'build_analytics', 'show_analytics')
+    
+    def __init__(self, instrumentation=None):
         self.root = tk.Tk()
         self.root.title("Financial Control Pro")
         self.root.geometry("1600x900")
         self.root.state('zoomed')  # Start maximized on Windows
         
         # Initialize components
-        self.db_manager = DatabaseManager()
+        database = DatabaseManager()
+        self.db_manager = RecordCache(database)
         self.value_entries = []  # List to store dynamic value entries
         
+        # Optional timing of database calls and refreshes, wrapped before any callback is bound
+        self.instrumentation = instrumentation
+        if instrumentation is not None:
+            instrumentation.instrument_database(database)
+            instrumentation.wrap(self, self.INSTRUMENTED_METHODS, 'MainWindow',
+                                 state=lambda: database.generation)
+        
         # Apply dark theme
         self.theme = DarkTheme()
         self.style = self.theme.configure_styles(self.root)
         
-        # Initialize charts
-        self.charts = FinancialCharts(self.root, self.theme.COLORS)
+        # Charts need matplotlib, which is imported in the background by load_charts
+        self.charts = None
+        self.pending_dashboard = None
+        
+        # Columnar history and projections for the analytics tab, created on first use (they need numpy)
+        self.time_series = None
+        self.forecaster = None
+        self.pending_projection = None
+        
+        # Database reads and figure building run off the Tk thread
+        self.tasks = BackgroundTaskRunner(self.root)
         
         self.setup_ui()
-        self.load_records()
-        self.update_value_entries_from_db()  # Populate entries based on existing data
-        self.refresh_dashboard()  # Load dashboard charts
+        if instrumentation is not None:
+            instrumentation.wrap(self.records_table, ('fetch_state', 'apply_state'), 'VirtualRecordTable',
+                                 state=lambda: database.generation)
+        self.load_records()  # Also populates entries based on existing data
+        self.load_charts()
+        self.refresh_dashboard()  # Load dashboard charts and header stats
     
     def setup_ui(self):
         """Setup the modern user interface"""
@@ -57,6 +98,10 @@ class MainWindow:
         
         # Bind tab change event
         self.notebook.bind('<<NotebookTabChanged>>', self.on_tab_changed)
+        
+        # Undo and redo changes to the records
+        self.root.bind('<Control-z>', lambda e: self.undo_change())
+        self.root.bind('<Control-y>', lambda e: self.redo_change())
     
     def create_header(self, parent):
         """Create application header"""
@@ -80,23 +125,39 @@ class MainWindow:
         self.stats_frame = ttk.Frame(header_frame, style='Main.TFrame')
         self.stats_frame.grid(row=0, column=1, sticky=tk.E)
         
-        self.update_header_stats()
+        ttk.Button(header_frame, text="↶ Desfazer", 
+                  command=self.undo_change).grid(row=0, column=2, sticky=tk.E, padx=(10, 0))
+        ttk.Button(header_frame, text="↷ Refazer", 
+                  command=self.redo_change).grid(row=0, column=3, sticky=tk.E, padx=(10, 0))
+        
+        if self.instrumentation is not None:
+            ttk.Button(header_frame, text="🩺 Diagnóstico", 
+                      command=self.open_diagnostics).grid(row=0, column=4, sticky=tk.E, padx=(10, 0))
     
     def update_header_stats(self):
         """Update header statistics"""
+        self.render_header_stats(self.load_header_stats())
+    
+    def load_header_stats(self):
+        """Load the latest record summary and the record count"""
+        latest_records = self.db_manager.get_record_summaries(limit=1)
+        if not latest_records:
+            return None
+        return latest_records[0], self.db_manager.count_records()
+    
+    def render_header_stats(self, header_stats):
+        """Show header statistics loaded by load_header_stats"""
         # Clear existing stats
         for widget in self.stats_frame.winfo_children():
             widget.destroy()
         
-        records = self.db_manager.get_all_records()
-        if records:
-            latest = records[0]
-            total_records = len(records)
+        if header_stats:
+            latest, total_records = header_stats
             
             # Create stat cards
             stats = [
-                ("Total Atual", f"R$ {latest['total']:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")),
-                ("Com FGTS", f"R$ {latest['total_with_fgts']:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")),
+                ("Total Atual", format_currency(latest['total'])),
+                ("Com FGTS", format_currency(latest['total_with_fgts'])),
                 ("Registros", str(total_records))
             ]
             
@@ -399,12 +460,7 @@ class MainWindow:
     
     def get_all_value_names_from_db(self):
         """Get all unique value names from the database"""
-        records = self.db_manager.get_all_records()
-        all_value_names = set()
-        for record in records:
-            for value in record['values']:
-                all_value_names.add(value['name'])
-        return sorted(list(all_value_names))
+        return self.db_manager.get_all_value_names()
     
     def update_value_entries_from_db(self):
         """Update value entries based on existing database columns"""
@@ -494,7 +550,8 @@ class MainWindow:
     
     def refresh_columns_listbox(self):
         """Refresh the database columns listbox"""
-        if hasattr(self, 'columns_listbox'):
+        # The attribute outlives the listbox once the column manager window is closed
+        if hasattr(self, 'columns_listbox') and self.columns_listbox.winfo_exists():
             self.columns_listbox.delete(0, tk.END)
             columns = self.get_all_value_names_from_db()
             for col in columns:
@@ -560,15 +617,19 @@ class MainWindow:
                                  f"Tem certeza que deseja renomear a coluna '{old_name}' para '{new_name}'?\n\n"
                                  f"Esta operação afetará todos os registros existentes."):
                 
-                success = self.db_manager.rename_value_column(old_name, new_name)
-                if success:
-                    messagebox.showinfo("Sucesso", f"Coluna renomeada de '{old_name}' para '{new_name}'!")
-                    self.refresh_columns_listbox()
-                    self.load_records()  # Refresh the main table
-                    self.update_value_entries_from_db()  # Update input fields
-                    rename_dialog.destroy()
-                else:
-                    messagebox.showerror("Erro", "Erro ao renomear a coluna")
+                self.tasks.submit(None, lambda: self.db_manager.rename_value_column(old_name, new_name),
+                                  lambda success: on_renamed(new_name, success),
+                                  lambda e: messagebox.showerror("Erro", f"Erro inesperado: {str(e)}"))
+        
+        def on_renamed(new_name, success):
+            if success:
+                messagebox.showinfo("Sucesso", f"Coluna renomeada de '{old_name}' para '{new_name}'!")
+                self.refresh_columns_listbox()
+                self.load_records()  # Refresh the main table
+                self.update_value_entries_from_db()  # Update input fields
+                rename_dialog.destroy()
+            else:
+                messagebox.showerror("Erro", "Erro ao renomear a coluna")
         
         ttk.Button(button_frame, text="Renomear", command=confirm_rename).pack(side=tk.RIGHT, padx=(10, 0))
         ttk.Button(button_frame, text="Cancelar", command=rename_dialog.destroy).pack(side=tk.RIGHT)
@@ -588,17 +649,24 @@ class MainWindow:
                              f"Esta operação:\n"
                              f"• Removerá todos os valores desta coluna de todos os registros\n"
                              f"• Recalculará os totais automaticamente\n"
-                             f"• NÃO PODE SER DESFEITA\n\n"
+                             f"• Pode ser desfeita com Ctrl+Z\n\n"
                              f"Deseja continuar?"):
             
-            success = self.db_manager.delete_value_column(column_name)
-            if success:
-                messagebox.showinfo("Sucesso", f"Coluna '{column_name}' excluída com sucesso!")
-                self.refresh_columns_listbox()
-                self.load_records()  # Refresh the main table
-                self.update_value_entries_from_db()  # Update input fields
-            else:
-                messagebox.showerror("Erro", "Erro ao excluir a coluna")
+            # Totals and differences of the whole history are recomputed, so it runs in the background
+            self.tasks.submit(None, lambda: (column_name, self.db_manager.delete_value_column(column_name)),
+                              self.on_column_deleted,
+                              lambda e: messagebox.showerror("Erro", f"Erro inesperado: {str(e)}"))
+    
+    def on_column_deleted(self, result):
+        """Update the interface once a column deletion finished"""
+        column_name, success = result
+        if success:
+            messagebox.showinfo("Sucesso", f"Coluna '{column_name}' excluída com sucesso!")
+            self.refresh_columns_listbox()
+            self.load_records()  # Refresh the main table
+            self.update_value_entries_from_db()  # Update input fields
+        else:
+            messagebox.showerror("Erro", "Erro ao excluir a coluna")
     
     def create_new_column(self):
         """Create a new column (add to input fields)"""
@@ -659,23 +727,59 @@ class MainWindow:
         self.notebook.add(analytics_frame, text='📈 Análises')
         
         analytics_frame.columnconfigure(0, weight=1)
-        analytics_frame.rowconfigure(0, weight=1)
-        
-        # Placeholder for future analytics features
-        placeholder_frame = ttk.Frame(analytics_frame, style='Main.TFrame')
-        placeholder_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        placeholder_frame.columnconfigure(0, weight=1)
-        placeholder_frame.rowconfigure(0, weight=1)
-        
-        content_frame = ttk.Frame(placeholder_frame, style='Main.TFrame')
-        content_frame.grid(row=0, column=0)
-        
-        ttk.Label(content_frame, text="📊", font=('Segoe UI', 48)).pack(pady=(50, 20))
-        ttk.Label(content_frame, text="Análises Avançadas", style='Title.TLabel').pack(pady=(0, 10))
-        ttk.Label(content_frame, text="Funcionalidades de análise detalhada em desenvolvimento", 
-                 style='Body.TLabel').pack()
-        ttk.Label(content_frame, text="• Projeções financeiras\n• Análise de tendências\n• Relatórios personalizados\n• Comparações temporais", 
-                 style='Muted.TLabel', justify=tk.LEFT).pack(pady=(20, 0))
+        analytics_frame.rowconfigure(1, weight=1)
+        
+        # Indicator cards
+        indicators_frame = ttk.LabelFrame(analytics_frame, text="Indicadores", style='Modern.TLabelframe', padding=10)
+        indicators_frame.grid(row=0, column=0, sticky=(tk.W, tk.E), pady=(0, 20), padx=10)
+        
+        self.indicator_labels = {}
+        indicators = [
+            ('cagr', "Crescimento Anual Composto (CAGR)"),
+            ('mom', "Variação Mensal"),
+            ('yoy', "Variação Anual"),
+            ('rolling_mean', f"Média Móvel ({self.ROLLING_WINDOW} registros)"),
+        ]
+        for i, (key, label) in enumerate(indicators):
+            indicators_frame.columnconfigure(i, weight=1)
+            card = ttk.Frame(indicators_frame, style='Card.TFrame')
+            card.grid(row=0, column=i, sticky=(tk.W, tk.E), padx=5)
+            
+            self.indicator_labels[key] = ttk.Label(card, text="-", style='Heading.TLabel')
+            self.indicator_labels[key].pack(pady=(10, 0), padx=15)
+            ttk.Label(card, text=label, style='Muted.TLabel').pack(pady=(0, 10), padx=15)
+        
+        # Projection of the totals, with the fitting method
+        projection_frame = ttk.LabelFrame(analytics_frame, text="Projeções Financeiras", 
+                                          style='Modern.TLabelframe', padding=10)
+        projection_frame.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 20), padx=10)
+        projection_frame.columnconfigure(1, weight=1)
+        projection_frame.rowconfigure(1, weight=1)
+        
+        ttk.Label(projection_frame, text="Método:", style='Body.TLabel').grid(row=0, column=0, sticky=tk.W, padx=(0, 10))
+        self.projection_method = tk.StringVar(value=next(iter(self.FORECAST_METHODS)))
+        method_combo = ttk.Combobox(projection_frame, textvariable=self.projection_method, state='readonly',
+                                    values=list(self.FORECAST_METHODS), width=20)
+        method_combo.grid(row=0, column=1, sticky=tk.W, pady=(0, 10))
+        method_combo.bind('<<ComboboxSelected>>', lambda e: self.refresh_analytics())
+        
+        self.projection_chart_frame = ttk.Frame(projection_frame, style='Main.TFrame')
+        self.projection_chart_frame.grid(row=1, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S))
+        
+        # Contribution of each value name to the latest total
+        contribution_frame = ttk.LabelFrame(analytics_frame, text="Contribuição por Fonte", 
+                                            style='Modern.TLabelframe', padding=10)
+        contribution_frame.grid(row=2, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 20), padx=10)
+        contribution_frame.columnconfigure(0, weight=1)
+        contribution_frame.rowconfigure(0, weight=1)
+        
+        columns = ['Fonte', 'Valor', 'Participação']
+        self.contribution_tree = ttk.Treeview(contribution_frame, columns=columns, show='headings',
+                                              height=5, style='Modern.Treeview')
+        for col in columns:
+            self.contribution_tree.heading(col, text=col)
+            self.contribution_tree.column(col, width=150, minwidth=100)
+        self.contribution_tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
     
     def create_records_section(self, parent):
         """Create modern records display section"""
@@ -684,47 +788,156 @@ class MainWindow:
         table_frame.columnconfigure(0, weight=1)
         table_frame.rowconfigure(0, weight=1)
         
-        # Create treeview with modern styling
-        self.tree = ttk.Treeview(table_frame, show='headings', height=20, style='Modern.Treeview')
-        
-        # Scrollbars
-        v_scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=self.tree.yview)
-        h_scrollbar = ttk.Scrollbar(table_frame, orient=tk.HORIZONTAL, command=self.tree.xview)
-        self.tree.configure(yscrollcommand=v_scrollbar.set, xscrollcommand=h_scrollbar.set)
-        
-        # Grid layout
-        self.tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        v_scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
-        h_scrollbar.grid(row=1, column=0, sticky=(tk.W, tk.E))
+        # Records are rendered lazily, only for the rows in view
+        self.records_table = VirtualRecordTable(table_frame, self.db_manager)
+        self.records_table.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.tree = self.records_table.tree
     
     def on_tab_changed(self, event):
         """Handle tab change events"""
         selected_tab = event.widget.tab('current')['text']
         
-        if '📊 Dashboard' in selected_tab:
+        shown_task = next((key for label, key in self.TAB_TASKS.items() if label in selected_tab), None)
+        
+        # Refreshes of the tabs not shown are stale: drop them so they free the workers
+        for key in self.TAB_TASKS.values():
+            if key != shown_task:
+                self.tasks.cancel(key)
+        
+        if shown_task == 'dashboard':
             self.refresh_dashboard()
-        elif '📋 Registros' in selected_tab:
+        elif shown_task == 'records':
             self.load_records()
+        elif shown_task == 'analytics':
+            self.refresh_analytics()
+    
+    def chart_frames(self):
+        return (self.evolution_chart_frame, self.breakdown_chart_frame, self.growth_chart_frame)
+    
+    def load_charts(self):
+        """Import the chart module on a worker thread so the window opens without waiting for matplotlib"""
+        for frame in self.chart_frames():
+            tk.Label(frame, text="Carregando gráficos...", bg=self.theme.COLORS['bg_primary'],
+                     fg=self.theme.COLORS['text_muted'], font=('Segoe UI', 12), height=10).pack(fill=tk.BOTH, expand=True)
+        
+        self.tasks.submit('charts', self.import_charts, self.on_charts_loaded, self.on_charts_failed)
+    
+    def import_charts(self):
+        """Import matplotlib and the chart module (runs on a worker thread)"""
+        from gui.charts import FinancialCharts
+        # Imported only to warm up the Tk backend on the worker; it is first used when a chart is embedded
+        importlib.import_module('matplotlib.backends.backend_tkagg')
+        return FinancialCharts
+    
+    def on_charts_loaded(self, charts_class):
+        """Create the charts and draw any dashboard data that arrived first"""
+        self.charts = charts_class(self.root, self.theme.COLORS)
+        if self.pending_dashboard is not None:
+            dashboard, self.pending_dashboard = self.pending_dashboard, None
+            self.show_dashboard(dashboard)
+        if self.pending_projection is not None:
+            pending, self.pending_projection = self.pending_projection, None
+            self.show_projection(*pending)
+    
+    def on_charts_failed(self, error):
+        print(f"Error loading charts: {error}")
+        for frame in self.chart_frames() + (self.projection_chart_frame,):
+            for widget in frame.winfo_children():
+                widget.configure(text="Gráficos indisponíveis")
     
     def refresh_dashboard(self):
-        """Refresh dashboard charts and data"""
-        records = self.db_manager.get_all_records()
+        """Refresh dashboard charts and data in the background"""
+        if self.charts is not None:
+            for frame in self.chart_frames():
+                self.charts.show_loading(frame)
+        
+        self.tasks.submit('dashboard', self.build_dashboard, self.show_dashboard)
+    
+    def build_dashboard(self):
+        """Load dashboard data (runs on a worker thread)"""
+        return {
+            'header_stats': self.load_header_stats(),
+            'summary_columns': self.db_manager.get_summary_columns(),
+            'monthly_summaries': self.db_manager.get_period_summaries('month'),
+            # Only the latest record needs its individual values (breakdown chart)
+            'latest_records': self.db_manager.get_records(limit=1),
+        }
+    
+    def show_dashboard(self, dashboard):
+        """Update the dashboard charts in place with data loaded by build_dashboard"""
+        self.render_header_stats(dashboard['header_stats'])
+        if self.charts is None:
+            # Drawn by on_charts_loaded once matplotlib is ready
+            self.pending_dashboard = dashboard
+            return
         
-        # Update header stats
-        self.update_header_stats()
+        series = self.charts.prepare_series(dashboard['summary_columns'])
+        self.charts.render_evolution_chart(self.evolution_chart_frame, series)
+        self.charts.render_breakdown_chart(self.breakdown_chart_frame, dashboard['latest_records'])
+        self.charts.render_growth_chart(self.growth_chart_frame,
+                                        self.charts.prepare_growth_series(dashboard['monthly_summaries']))
+    
+    def refresh_analytics(self):
+        """Recompute the analytics indicators and projections in the background"""
+        method = self.FORECAST_METHODS[self.projection_method.get()]
+        if self.charts is not None:
+            self.charts.show_loading(self.projection_chart_frame)
+        self.tasks.submit('analytics', lambda: self.build_analytics(method), self.show_analytics)
+    
+    def build_analytics(self, method='linear'):
+        """Compute the analytics indicators and projections (runs on a worker thread)"""
+        from analytics import metrics
+        from analytics.forecast import TrendForecaster
+        from analytics.time_series import TimeSeriesStore
+        
+        if self.time_series is None:
+            self.time_series = TimeSeriesStore(self.db_manager)
+            self.forecaster = TrendForecaster(self.db_manager)
+        series = self.time_series.snapshot()
+        dates, totals = series['dates'], series['totals']
+        
+        analytics = {'indicators': None, 'forecast': self.forecaster.forecast(method, self.FORECAST_MONTHS)}
+        if len(dates):
+            analytics['indicators'] = {
+                'cagr': metrics.cagr(dates, totals),
+                'mom': metrics.period_growth(dates, totals, 1)[1][-1],
+                'yoy': metrics.period_growth(dates, totals, 12)[1][-1],
+                'rolling_mean': metrics.rolling_mean(totals, self.ROLLING_WINDOW)[-1],
+                'contributions': metrics.contributions(series['names'], series['values']),
+            }
+        return analytics
+    
+    def show_analytics(self, analytics):
+        """Show indicators and projections computed by build_analytics"""
+        self.show_indicators(analytics['indicators'])
+        self.show_projection(analytics['forecast'])
+    
+    def show_indicators(self, indicators):
+        self.contribution_tree.delete(*self.contribution_tree.get_children())
+        if indicators is None:
+            for label in self.indicator_labels.values():
+                label.configure(text="-")
+            return
         
-        # Update charts
-        if hasattr(self, 'evolution_chart_frame'):
-            evolution_fig = self.charts.create_evolution_chart(records)
-            self.charts.embed_chart(self.evolution_chart_frame, evolution_fig)
+        # Indicators are NaN when there is not enough history to compute them
+        def percentage(fraction):
+            return "-" if math.isnan(fraction) else format_percentage(100 * fraction)
         
-        if hasattr(self, 'breakdown_chart_frame'):
-            breakdown_fig = self.charts.create_values_breakdown_chart(records)
-            self.charts.embed_chart(self.breakdown_chart_frame, breakdown_fig)
+        for key in ('cagr', 'mom', 'yoy'):
+            self.indicator_labels[key].configure(text=percentage(indicators[key]))
+        rolling_mean = indicators['rolling_mean']
+        self.indicator_labels['rolling_mean'].configure(
+            text="-" if math.isnan(rolling_mean) else format_currency(rolling_mean))
         
-        if hasattr(self, 'growth_chart_frame'):
-            growth_fig = self.charts.create_growth_chart(records)
-            self.charts.embed_chart(self.growth_chart_frame, growth_fig)
+        for name, amount, share in indicators['contributions']:
+            self.contribution_tree.insert('', 'end', values=(name, format_currency(amount), percentage(share)))
+    
+    def show_projection(self, forecast):
+        if self.charts is None:
+            # Drawn by on_charts_loaded once matplotlib is ready (forecast may be None)
+            self.pending_projection = (forecast,)
+            return
+        self.charts.render_projection_chart(self.projection_chart_frame, forecast)
     
     def add_record(self):
         """Add a new financial record"""
@@ -775,122 +988,110 @@ class MainWindow:
                 messagebox.showerror("Erro", "Adicione pelo menos um valor")
                 return
             
-            # Insert record
-            success = self.db_manager.insert_record(
-                self.date_var.get(), values, fgts
-            )
-            
-            if success:
-                messagebox.showinfo("Sucesso", "Registro adicionado com sucesso!")
-                self.clear_fields()
-                self.load_records()
-                self.refresh_dashboard()  # Update dashboard charts
-            else:
-                messagebox.showerror("Erro", "Erro ao adicionar registro")
-                
+            # Insert record in the background
+            date = self.date_var.get()
+            self.tasks.submit(None, lambda: self.save_record(date, values, fgts), self.on_record_saved,
+                              lambda e: messagebox.showerror("Erro", f"Erro inesperado: {str(e)}"))
+        
         except Exception as e:
             messagebox.showerror("Erro", f"Erro inesperado: {str(e)}")
     
+    def save_record(self, date, values, fgts):
+        """Insert a validated record (runs on a worker thread)"""
+        # An existing day keeps its ID; its row is redrawn in place
+        existing = self.db_manager.get_record_by_date(date)
+        success = self.db_manager.insert_record(date, values, fgts)
+        if success and self.time_series is not None:
+            self.time_series.apply_upsert(date)
+        return date, success, existing['id'] if existing else None
+    
+    def on_record_saved(self, result):
+        """Update the interface once save_record finished"""
+        date, success, replaced_id = result
+        if success:
+            messagebox.showinfo("Sucesso", "Registro adicionado com sucesso!")
+            self.clear_fields()
+            self.records_table.apply_upsert(date, replaced_id)
+            self.update_value_entries_from_db()
+            self.refresh_dashboard()  # Update dashboard charts
+        else:
+            messagebox.showerror("Erro", "Erro ao adicionar registro")
+    
     def load_records(self):
-        """Load and display all records"""
-        # Clear existing items
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        # Load records from database
-        records = self.db_manager.get_all_records()
-        
-        if not records:
-            return
-        
-        # Determine all unique value names across all records
-        all_value_names = set()
-        for record in records:
-            for value in record['values']:
-                all_value_names.add(value['name'])
-        
-        # Create columns dynamically
-        base_columns = ['ID', 'Data']
-        value_columns = sorted(list(all_value_names))
-        summary_columns = ['Total', 'Diferença %', 'Aumento Real', 'FGTS', 
-                          'Total + FGTS', 'Diferença % Total', 'Diferença Real Total']
-        
-        all_columns = base_columns + value_columns + summary_columns
-        
-        # Configure treeview columns
-        self.tree['columns'] = all_columns
-        
-        for col in all_columns:
-            self.tree.heading(col, text=col)
-            if col == 'ID':
-                self.tree.column(col, width=50, minwidth=50)
-            elif col == 'Data':
-                self.tree.column(col, width=100, minwidth=100)
-            else:
-                self.tree.column(col, width=120, minwidth=100)
-        
-        # Insert records
-        for record in records:
-            # Create FinancialRecord object for formatting
-            financial_record = FinancialRecord(
-                id=record['id'],
-                date=record['date'],
-                values=record['values'],
-                total=record['total'],
-                percentage_diff=record['percentage_diff'],
-                real_increase=record['real_increase'],
-                fgts=record['fgts'],
-                total_with_fgts=record['total_with_fgts'],
-                total_percentage_diff=record['total_percentage_diff'],
-                total_real_diff=record['total_real_diff']
-            )
-            
-            # Create row data
-            row_data = [record['id'], record['date']]
-            
-            # Add value columns
-            value_dict = {v['name']: v['amount'] for v in record['values']}
-            for col_name in value_columns:
-                if col_name in value_dict:
-                    row_data.append(financial_record.format_currency(value_dict[col_name]))
-                else:
-                    row_data.append("-")
-            
-            # Add summary columns
-            row_data.extend([
-                financial_record.format_currency(record['total']),
-                financial_record.format_percentage(record['percentage_diff']),
-                financial_record.format_currency(record['real_increase']),
-                financial_record.format_currency(record['fgts']),
-                financial_record.format_currency(record['total_with_fgts']),
-                financial_record.format_percentage(record['total_percentage_diff']),
-                financial_record.format_currency(record['total_real_diff'])
-            ])
-            
-            self.tree.insert('', 'end', values=row_data)
+        """Load the records in view in the background"""
+        self.tasks.submit('records', self.records_table.fetch_state, self.show_records)
+    
+    def show_records(self, state):
+        """Display records loaded by load_records"""
+        self.records_table.apply_state(state)
         
         # Update value entries if new columns were found
         self.update_value_entries_from_db()
     
     def delete_selected(self):
         """Delete selected record"""
-        selected_item = self.tree.selection()
-        if not selected_item:
+        record_id = self.records_table.selected_record_id()
+        if record_id is None:
             messagebox.showwarning("Aviso", "Selecione um registro para excluir")
             return
         
         # Confirm deletion
         if messagebox.askyesno("Confirmar", "Tem certeza que deseja excluir este registro?"):
-            item = self.tree.item(selected_item)
-            record_id = item['values'][0]  # ID is the first column
             
-            success = self.db_manager.delete_record(record_id)
-            if success:
-                messagebox.showinfo("Sucesso", "Registro excluído com sucesso!")
-                self.load_records()
-                self.refresh_dashboard()  # Update dashboard charts
-            else:
-                messagebox.showerror("Erro", "Erro ao excluir registro")
+            date = self.tree.set(str(record_id), 'Data')
+            self.tasks.submit(None, lambda: self.delete_record(record_id, date), self.on_record_deleted,
+                              lambda e: messagebox.showerror("Erro", f"Erro inesperado: {str(e)}"))
+    
+    def delete_record(self, record_id, date):
+        """Delete a record (runs on a worker thread)"""
+        success = self.db_manager.delete_record(record_id)
+        if success and self.time_series is not None:
+            self.time_series.apply_delete(date)
+        return record_id, success
+    
+    def on_record_deleted(self, result):
+        """Update the interface once delete_record finished"""
+        record_id, success = result
+        if success:
+            messagebox.showinfo("Sucesso", "Registro excluído com sucesso!")
+            self.records_table.apply_delete(record_id)
+            self.refresh_dashboard()  # Update dashboard charts
+        else:
+            messagebox.showerror("Erro", "Erro ao excluir registro")
+    
+    def undo_change(self):
+        """Revert the latest change to the records, after confirmation"""
+        description = self.db_manager.get_undo_description()
+        if description is None:
+            messagebox.showinfo("Desfazer", "Nada para desfazer")
+            return
+        if messagebox.askyesno("Confirmar", f"Desfazer '{description}'?"):
+            self.replay_change(self.db_manager.undo)
+    
+    def redo_change(self):
+        """Apply again the latest undone change, after confirmation"""
+        description = self.db_manager.get_redo_description()
+        if description is None:
+            messagebox.showinfo("Refazer", "Nada para refazer")
+            return
+        if messagebox.askyesno("Confirmar", f"Refazer '{description}'?"):
+            self.replay_change(self.db_manager.redo)
+    
+    def replay_change(self, replay):
+        """Run undo or redo in the background; on_change_replayed reloads what it changed"""
+        self.tasks.submit(None, replay, self.on_change_replayed,
+                          lambda e: messagebox.showerror("Erro", f"Erro inesperado: {str(e)}"))
+    
+    def on_change_replayed(self, result):
+        """Reload everything an undo or redo may have changed"""
+        success, message = result
+        if success:
+            self.refresh_columns_listbox()
+            self.load_records()
+            self.update_value_entries_from_db()
+            self.refresh_dashboard()
+        else:
+            messagebox.showerror("Erro", f"Erro ao desfazer/refazer: {message}")
     
     def clear_fields(self):
         """Clear all input fields"""
@@ -901,6 +1102,16 @@ class MainWindow:
         for entry in self.value_entries:
             entry['value_var'].set("")
     
+    def open_diagnostics(self):
+        """Open the window with the instrumentation statistics"""
+        from gui.diagnostics import DiagnosticsPanel
+        DiagnosticsPanel(self.root, self.instrumentation)
+    
     def run(self):
         """Start the application"""
-        self.root.mainloop()
\ No newline at end of file
+        try:
+            self.root.mainloop()
+        finally:
+            # Running tasks still use their connections, so they finish before the database closes
+            self.tasks.shutdown(wait=True)
+            self.db_manager.close()
\ No newline at end of file
@@ -0,0 +1,86 @@
+"""
+Background task layer keeping database and chart work off the Tk main loop
+"""
+import itertools
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+class BackgroundTaskRunner:
+    """Run work on worker threads and deliver results on the Tk main loop
+    
+    Tasks are submitted under a key. Submitting again under the same key, or
+    cancelling the key, makes any earlier result stale: it is dropped instead
+    of being delivered. Callbacks always run on the Tk thread, polled with
+    root.after, because Tk must not be touched from the workers.
+    """
+    
+    # Milliseconds between checks for finished tasks
+    POLL_INTERVAL_MS = 25
+    
+    def __init__(self, root, max_workers: int = 2):
+        self.root = root
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='finance-worker')
+        self._finished = queue.Queue()
+        self._tokens = {}
+        self._futures = {}
+        self._polling = False
+        self._anonymous_keys = itertools.count()
+    
+    def submit(self, key, work, on_done, on_error=None):
+        """Run work() in the background and call on_done(result) on the Tk thread
+        
+        A key of None gives the task a key of its own, so it is never superseded.
+        """
+        if key is None:
+            key = ('anonymous', next(self._anonymous_keys))
+        self.cancel(key)
+        token = self._tokens[key]
+        future = self.executor.submit(work)
+        self._futures[key] = future
+        future.add_done_callback(lambda done: self._finished.put((key, token, done, on_done, on_error)))
+        self._schedule_poll()
+        return token
+    
+    def cancel(self, key):
+        """Make the pending task under key stale, stopping it if it has not started"""
+        self._tokens[key] = self._tokens.get(key, 0) + 1
+        future = self._futures.pop(key, None)
+        if future is not None:
+            future.cancel()
+    
+    def _schedule_poll(self):
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.POLL_INTERVAL_MS, self._poll)
+    
+    def _poll(self):
+        """Deliver finished tasks whose results are still current"""
+        while True:
+            try:
+                key, token, future, on_done, on_error = self._finished.get_nowait()
+            except queue.Empty:
+                break
+            
+            if future.cancelled() or token != self._tokens.get(key):
+                continue
+            self._futures.pop(key, None)
+            if isinstance(key, tuple) and key[0] == 'anonymous':
+                del self._tokens[key]
+            
+            error = future.exception()
+            if error is None:
+                on_done(future.result())
+            elif on_error is not None:
+                on_error(error)
+            else:
+                print(f"Error in background task '{key}': {error}")
+        
+        self._polling = False
+        if self._futures:
+            self._schedule_poll()
+    
+    def shutdown(self, wait: bool = False):
+        """Drop pending work and stop the workers, waiting for running tasks if wait is set"""
+        for key in list(self._futures):
+            self.cancel(key)
+        self.executor.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,327 @@
+"""
+Virtualized records table that only materializes the rows in view
+"""
+import tkinter as tk
+from tkinter import ttk
+from utils.formatting import format_currency, format_percentage
+
+class VirtualRecordTable:
+    """Treeview showing records page by page as the user scrolls
+    
+    The Treeview only ever holds the rows that fit in its viewport. Pages of
+    records are fetched from the database on demand, formatted once and kept
+    in a small cache around the current position, so the cost of rendering
+    does not depend on how many records are stored.
+    """
+    
+    BASE_COLUMNS = ['ID', 'Data']
+    SUMMARY_COLUMNS = ['Total', 'Diferença %', 'Aumento Real', 'FGTS',
+                       'Total + FGTS', 'Diferença % Total', 'Diferença Real Total']
+    
+    # Records fetched per database round trip
+    PAGE_SIZE = 100
+    
+    # Pages kept formatted in memory around the viewport
+    MAX_CACHED_PAGES = 5
+    
+    # Fallback row and heading heights in pixels
+    DEFAULT_ROW_HEIGHT = 20
+    HEADING_HEIGHT = 25
+    
+    def __init__(self, parent, db_manager):
+        self.db_manager = db_manager
+        self.total_rows = 0
+        self.first_row = 0
+        self.visible_rows = 20
+        self.value_columns = []
+        self.selected_id = None
+        self._pages = {}
+        
+        self.frame = ttk.Frame(parent, style='Main.TFrame')
+        self.frame.columnconfigure(0, weight=1)
+        self.frame.rowconfigure(0, weight=1)
+        
+        # Create treeview with modern styling
+        self.tree = ttk.Treeview(self.frame, show='headings', height=self.visible_rows,
+                                 style='Modern.Treeview', selectmode='browse')
+        
+        # The vertical scrollbar tracks the whole record set, not the Treeview items
+        self.v_scrollbar = ttk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self.on_scrollbar)
+        h_scrollbar = ttk.Scrollbar(self.frame, orient=tk.HORIZONTAL, command=self.tree.xview)
+        self.tree.configure(xscrollcommand=h_scrollbar.set)
+        
+        # Grid layout
+        self.tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.v_scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        h_scrollbar.grid(row=1, column=0, sticky=(tk.W, tk.E))
+        
+        self.tree.bind('<Configure>', self.on_resize)
+        self.tree.bind('<MouseWheel>', self.on_mousewheel)
+        self.tree.bind('<Button-4>', lambda e: self.scroll_rows(-3))
+        self.tree.bind('<Button-5>', lambda e: self.scroll_rows(3))
+        self.tree.bind('<Up>', lambda e: self.on_arrow_key(-1))
+        self.tree.bind('<Down>', lambda e: self.on_arrow_key(1))
+        self.tree.bind('<Prior>', lambda e: self.scroll_rows(-self.visible_rows))
+        self.tree.bind('<Next>', lambda e: self.scroll_rows(self.visible_rows))
+        self.tree.bind('<<TreeviewSelect>>', self.on_select)
+    
+    def grid(self, **kwargs):
+        self.frame.grid(**kwargs)
+    
+    def reload(self):
+        """Reload record count and columns, then render the current viewport"""
+        self.apply_state(self.fetch_state())
+    
+    def fetch_state(self):
+        """Load what the current viewport needs without touching Tk
+        
+        Safe to run on a worker thread; pass the result to apply_state.
+        """
+        total_rows = self.db_manager.count_records()
+        value_columns = self.db_manager.get_all_value_names()
+        first_row = max(0, min(self.first_row, total_rows - self.visible_rows))
+        
+        pages = {}
+        for page in range(first_row // self.PAGE_SIZE, (first_row + self.visible_rows) // self.PAGE_SIZE + 1):
+            records = self.db_manager.get_records(limit=self.PAGE_SIZE, offset=page * self.PAGE_SIZE)
+            pages[page] = [self.format_row(record, value_columns) for record in records]
+        
+        return {'total_rows': total_rows, 'value_columns': value_columns, 'pages': pages}
+    
+    def apply_state(self, state):
+        """Render a state loaded by fetch_state"""
+        self.total_rows = state['total_rows']
+        self.configure_columns(state['value_columns'])
+        self._pages = dict(state['pages'])
+        self.first_row = max(0, min(self.first_row, self.total_rows - self.visible_rows))
+        self.render()
+    
+    def apply_upsert(self, date, replaced_id=None):
+        """Show a record inserted (or replaced) at date without rebuilding the view
+        
+        Only the new row and the row of the following day, whose differences
+        changed, are touched. replaced_id is the ID of the record the date already
+        had, if any; replacing a day keeps its ID.
+        """
+        if self.columns_changed():
+            self.reload()
+            return
+        
+        record = self.db_manager.get_record_by_date(date)
+        if record is None:
+            return
+        
+        # Positions after the cached pages shifted, so they are fetched again when needed
+        self._pages.clear()
+        
+        if replaced_id is not None:
+            if self.tree.exists(str(replaced_id)):
+                self.tree.delete(str(replaced_id))
+        else:
+            self.total_rows += 1
+        
+        position = self.db_manager.count_records(after_date=date)
+        if position < self.first_row and replaced_id is None:
+            # Inserted above the viewport: keep showing the same records
+            self.first_row += 1
+        elif self.first_row <= position < self.first_row + self.visible_rows:
+            row_data = self.format_row(record)
+            self.tree.insert('', position - self.first_row, iid=str(record['id']), values=row_data)
+        
+        self.trim_viewport()
+        self.refresh_successor(date)
+        self.update_scrollbar()
+    
+    def apply_delete(self, record_id):
+        """Remove a deleted record from the view without rebuilding it"""
+        iid = str(record_id)
+        date = self.tree.set(iid, 'Data') if self.tree.exists(iid) else None
+        if date is None:
+            self.reload()
+            return
+        
+        self.tree.delete(iid)
+        self._pages.clear()
+        self.total_rows -= 1
+        if self.selected_id == record_id:
+            self.selected_id = None
+        
+        if self.columns_changed():
+            self.reload()
+            return
+        
+        # Pull the next row up to fill the viewport
+        items = len(self.tree.get_children())
+        if items < self.visible_rows:
+            for row_data in self.get_rows(self.first_row + items, self.visible_rows - items):
+                self.tree.insert('', 'end', iid=str(row_data[0]), values=row_data)
+        
+        self.refresh_successor(date)
+        self.update_scrollbar()
+    
+    def refresh_successor(self, date):
+        """Redraw the row after date, whose differences depend on date's record"""
+        successor = self.db_manager.get_adjacent_record(date, newer=True)
+        if successor is not None and self.tree.exists(str(successor['id'])):
+            self.tree.item(str(successor['id']), values=self.format_row(successor))
+    
+    def trim_viewport(self):
+        """Drop items pushed below the viewport"""
+        items = self.tree.get_children()
+        if len(items) > self.visible_rows:
+            self.tree.delete(*items[self.visible_rows:])
+    
+    def columns_changed(self):
+        return self.db_manager.get_all_value_names() != self.value_columns
+    
+    def configure_columns(self, value_columns):
+        """Configure treeview columns for the given value names"""
+        if list(value_columns) == self.value_columns and self.tree['columns']:
+            return
+        
+        self.value_columns = list(value_columns)
+        all_columns = self.BASE_COLUMNS + self.value_columns + self.SUMMARY_COLUMNS
+        self.tree['columns'] = all_columns
+        
+        for col in all_columns:
+            self.tree.heading(col, text=col)
+            if col == 'ID':
+                self.tree.column(col, width=50, minwidth=50)
+            elif col == 'Data':
+                self.tree.column(col, width=100, minwidth=100)
+            else:
+                self.tree.column(col, width=120, minwidth=100)
+    
+    def format_row(self, record, value_columns=None):
+        """Build the displayed values of one record"""
+        if value_columns is None:
+            value_columns = self.value_columns
+        # Create row data
+        row_data = [record.id, record.date]
+        
+        # Add value columns
+        value_dict = record.value_amounts()
+        for col_name in value_columns:
+            if col_name in value_dict:
+                row_data.append(format_currency(value_dict[col_name]))
+            else:
+                row_data.append("-")
+        
+        # Add summary columns
+        row_data.extend([
+            format_currency(record.total),
+            format_percentage(record.percentage_diff),
+            format_currency(record.real_increase),
+            format_currency(record.fgts),
+            format_currency(record.total_with_fgts),
+            format_percentage(record.total_percentage_diff),
+            format_currency(record.total_real_diff)
+        ])
+        
+        return row_data
+    
+    def get_page(self, page):
+        """Get the formatted rows of one page, fetching it if needed"""
+        if page not in self._pages:
+            records = self.db_manager.get_records(limit=self.PAGE_SIZE, offset=page * self.PAGE_SIZE)
+            self._pages[page] = [self.format_row(record) for record in records]
+            
+            # Drop the pages furthest from the one being shown
+            while len(self._pages) > self.MAX_CACHED_PAGES:
+                del self._pages[max(self._pages, key=lambda cached: abs(cached - page))]
+        return self._pages[page]
+    
+    def get_rows(self, start, count):
+        """Get formatted rows start..start+count, spanning pages as needed"""
+        rows = []
+        position = start
+        end = min(start + count, self.total_rows)
+        while position < end:
+            page, index = divmod(position, self.PAGE_SIZE)
+            page_rows = self.get_page(page)[index:index + end - position]
+            if not page_rows:
+                break
+            rows.extend(page_rows)
+            position += len(page_rows)
+        return rows
+    
+    def render(self):
+        """Replace the Treeview items with the rows of the current viewport"""
+        self.tree.delete(*self.tree.get_children())
+        
+        for row_data in self.get_rows(self.first_row, self.visible_rows):
+            self.tree.insert('', 'end', iid=str(row_data[0]), values=row_data)
+        
+        # Keep the selection when its record is still in view
+        if self.selected_id is not None and self.tree.exists(str(self.selected_id)):
+            self.tree.selection_set(str(self.selected_id))
+        
+        self.update_scrollbar()
+    
+    def update_scrollbar(self):
+        if self.total_rows <= self.visible_rows:
+            self.v_scrollbar.set(0.0, 1.0)
+        else:
+            self.v_scrollbar.set(self.first_row / self.total_rows,
+                                 (self.first_row + self.visible_rows) / self.total_rows)
+    
+    def scroll_to(self, first_row):
+        """Move the viewport so first_row is the top visible row"""
+        first_row = max(0, min(int(first_row), self.total_rows - self.visible_rows))
+        if first_row != self.first_row:
+            self.first_row = first_row
+            self.render()
+    
+    def scroll_rows(self, delta):
+        self.scroll_to(self.first_row + delta)
+        return 'break'
+    
+    def on_scrollbar(self, action, amount, unit=None):
+        """Handle scrollbar drags and arrow clicks"""
+        if action == 'moveto':
+            self.scroll_to(float(amount) * self.total_rows)
+        elif action == 'scroll':
+            step = self.visible_rows if unit == 'pages' else 1
+            self.scroll_rows(int(amount) * step)
+    
+    def on_mousewheel(self, event):
+        return self.scroll_rows(-3 if event.delta > 0 else 3)
+    
+    def on_arrow_key(self, direction):
+        """Scroll the viewport when moving the selection past its edges"""
+        items = self.tree.get_children()
+        selection = self.tree.selection()
+        if not items or not selection:
+            return None
+        
+        index = items.index(selection[0]) + direction
+        if 0 <= index < len(items):
+            return None  # Let the Treeview move the selection itself
+        
+        self.scroll_rows(direction)
+        items = self.tree.get_children()
+        if items:
+            target = items[0] if direction < 0 else items[-1]
+            self.tree.selection_set(target)
+            self.tree.focus(target)
+        return 'break'
+    
+    def on_select(self, event):
+        selection = self.tree.selection()
+        if selection:
+            self.selected_id = int(selection[0])
+    
+    def on_resize(self, event):
+        """Recompute how many rows fit when the widget is resized"""
+        row_height = ttk.Style().lookup('Modern.Treeview', 'rowheight')
+        row_height = int(row_height) if row_height else self.DEFAULT_ROW_HEIGHT
+        visible_rows = max(1, (event.height - self.HEADING_HEIGHT) // row_height)
+        if visible_rows != self.visible_rows:
+            self.visible_rows = visible_rows
+            self.first_row = max(0, min(self.first_row, self.total_rows - self.visible_rows))
+            self.render()
+    
+    def selected_record_id(self):
+        """Get the ID of the selected record, or None"""
+        selection = self.tree.selection()
+        return int(selection[0]) if selection else None
@@ -4,15 +4,81 @@ Finance Control Application
 A modular application for managing financial records with visual interface
 """
 
-from gui.main_window import MainWindow
+import argparse
+import sys
+
+def import_history(path: str) -> int:
+    """Import a CSV or JSON-lines history file into the database"""
+    from database.db_manager import DatabaseManager
+    from utils.importers import read_history_file
+
+    with DatabaseManager() as db_manager:
+        try:
+            success, imported, error = db_manager.bulk_import(read_history_file(path))
+        except (OSError, ValueError) as e:
+            success, imported, error = False, 0, str(e)
+
+    if not success:
+        print(f"Erro ao importar '{path}': {error}")
+        return 1
+
+    print(f"{imported} registros importados de '{path}'")
+    return 0
+
+def export_history(path: str, export_format: str = None) -> int:
+    """Export every record to a wide CSV or columnar file"""
+    from database.db_manager import DatabaseManager
+
+    with DatabaseManager() as db_manager:
+        success, exported, error = db_manager.export_records(path, export_format)
+
+    if not success:
+        print(f"Erro ao exportar '{path}': {error}")
+        return 1
+
+    print(f"{exported} registros exportados para '{path}'")
+    return 0
 
 def main():
     """Main entry point of the application"""
+    parser = argparse.ArgumentParser(description="Financial Control Pro")
+    subparsers = parser.add_subparsers(dest='command')
+
+    import_parser = subparsers.add_parser('import', help="importar histórico de um arquivo CSV ou JSON-lines")
+    import_parser.add_argument('path', help="arquivo com colunas date, value_name, amount, fgts")
+
+    export_parser = subparsers.add_parser('export', help="exportar registros para CSV ou arquivo colunar")
+    export_parser.add_argument('path', help="arquivo de destino (.csv ou .fcol)")
+    export_parser.add_argument('--format', choices=['csv', 'columnar'], dest='export_format',
+                               help="formato de saída (padrão: pela extensão do arquivo)")
+
+    parser.add_argument('--instrument', nargs='?', const='', metavar='LOG',
+                        help="medir tempos do banco de dados e da interface (painel Diagnóstico); "
+                             "com LOG, salva o relatório em JSON ao sair")
+
+    args = parser.parse_args()
+
+    if args.command == 'import':
+        return import_history(args.path)
+    if args.command == 'export':
+        return export_history(args.path, args.export_format)
+
+    instrumentation = None
+    if args.instrument is not None:
+        from utils.instrumentation import Instrumentation
+        instrumentation = Instrumentation()
+
     try:
-        app = MainWindow()
+        from gui.main_window import MainWindow
+        app = MainWindow(instrumentation)
         app.run()
     except Exception as e:
         print(f"Error starting application: {e}")
 
+    if instrumentation is not None and args.instrument:
+        instrumentation.dump(args.instrument)
+        print(f"Diagnóstico salvo em '{args.instrument}'")
+    return 0
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
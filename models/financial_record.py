@@ -1,6 +1,9 @@
+import threading
+from array import array
 from dataclasses import dataclass, field
 from datetime import datetime
 from typing import Optional, List, Dict
+from utils import formatting
 
 @dataclass
 class FinancialRecord:
@@ -22,13 +25,15 @@ class FinancialRecord:
         self.total = sum(value['amount'] for value in self.values)
         self.total_with_fgts = self.total + self.fgts
     
-    def format_currency(self, value: float) -> str:
+    @staticmethod
+    def format_currency(value: float) -> str:
         """Format value as Brazilian currency"""
-        return f"R$ {value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+        return formatting.format_currency(value)
     
-    def format_percentage(self, value: float) -> str:
+    @staticmethod
+    def format_percentage(value: float) -> str:
         """Format value as percentage"""
-        return f"{value:.2f}%"
+        return formatting.format_percentage(value)
     
     def to_dict(self) -> dict:
         """Convert to dictionary for easy display"""
@@ -56,4 +61,119 @@ class FinancialRecord:
     
     def get_values_as_tuples(self) -> List[tuple]:
         """Get values as list of (name, amount) tuples"""
-        return [(value['name'], value['amount']) for value in self.values]
\ No newline at end of file
+        return [(value['name'], value['amount']) for value in self.values]
+
+class ValueNameIndex:
+    """Value names shared by the records of one database, each at a fixed position
+    
+    Records store positions instead of names, so renaming a name here renames
+    it in every record already built.
+    """
+    
+    __slots__ = ('names', '_positions', '_lock')
+    
+    def __init__(self):
+        self.names = []
+        self._positions = {}
+        self._lock = threading.Lock()
+    
+    def position(self, name: str) -> int:
+        """Position of name, adding it at the end if new"""
+        position = self._positions.get(name)
+        if position is None:
+            with self._lock:
+                position = self._positions.get(name)
+                if position is None:
+                    position = self._positions[name] = len(self.names)
+                    self.names.append(name)
+        return position
+    
+    def rename(self, old_name: str, new_name: str):
+        """Show the values stored under old_name as new_name"""
+        with self._lock:
+            position = self._positions.pop(old_name, None)
+            if position is not None:
+                # A name merged into another earlier holds several positions
+                for i, name in enumerate(self.names):
+                    if name == old_name:
+                        self.names[i] = new_name
+                # New values of a merged name keep using its existing position
+                self._positions.setdefault(new_name, position)
+
+
+class CompactRecord:
+    """Financial record as read from the database, without a dictionary per field or value
+    
+    The summary fields live in slots. The values are two parallel arrays:
+    value_positions holds the ValueNameIndex position of each value name and
+    amounts its amount, in display order.
+    
+    Records read like the dictionaries the database layer used to return:
+    record['total'], record.get('created_at') and record['values'] work, the
+    last building the list of {'name', 'amount', 'order'} dictionaries on
+    access.
+    """
+    
+    # Summary fields, in the order of DatabaseManager.RECORD_COLUMNS followed by date_key
+    FIELDS = ('id', 'date', 'fgts', 'total', 'total_with_fgts', 'percentage_diff', 'real_increase',
+              'total_percentage_diff', 'total_real_diff', 'created_at', 'date_key')
+    
+    __slots__ = FIELDS + ('name_index', 'value_positions', 'amounts')
+    
+    _FIELD_SET = frozenset(FIELDS)
+    
+    def __init__(self, row, name_index: ValueNameIndex):
+        (self.id, self.date, self.fgts, self.total, self.total_with_fgts, self.percentage_diff,
+         self.real_increase, self.total_percentage_diff, self.total_real_diff, self.created_at,
+         self.date_key) = row[:11]
+        self.name_index = name_index
+        self.value_positions = array('i')
+        self.amounts = array('d')
+    
+    def value_names(self) -> List[str]:
+        """Value names in display order"""
+        names = self.name_index.names
+        return [names[position] for position in self.value_positions]
+    
+    def value_amounts(self) -> Dict[str, float]:
+        """Amount of each value by name, adding up a name held twice after a column merge"""
+        amounts = {}
+        for name, amount in zip(self.value_names(), self.amounts):
+            amounts[name] = amounts.get(name, 0.0) + amount
+        return amounts
+    
+    def value_list(self) -> List[Dict[str, any]]:
+        """Values as {'name', 'amount', 'order'} dictionaries"""
+        return [{'name': name, 'amount': amount, 'order': order}
+                for order, (name, amount) in enumerate(zip(self.value_names(), self.amounts))]
+    
+    def __getitem__(self, key):
+        if key == 'values':
+            return self.value_list()
+        if key in self._FIELD_SET:
+            return getattr(self, key)
+        raise KeyError(key)
+    
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+    
+    def __contains__(self, key) -> bool:
+        return key == 'values' or key in self._FIELD_SET
+    
+    def keys(self):
+        return self.FIELDS + ('values',)
+    
+    def __iter__(self):
+        return iter(self.keys())
+    
+    def __len__(self) -> int:
+        return len(self.FIELDS) + 1
+    
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+    
+    def __repr__(self):
+        return f"CompactRecord(id={self.id!r}, date={self.date!r}, total={self.total!r}, values={len(self.amounts)})"
@@ -0,0 +1,107 @@
+"""
+Streaming writers for exported records
+"""
+import csv
+import json
+import math
+import struct
+import sys
+from array import array
+from datetime import date
+from typing import Dict, Iterable, Iterator, List
+from models.financial_record import CompactRecord
+
+# Summary columns written after the value columns, as (record key, header)
+SUMMARY_COLUMNS = (
+    ('total', 'Total'),
+    ('percentage_diff', 'Diferença %'),
+    ('real_increase', 'Aumento Real'),
+    ('fgts', 'FGTS'),
+    ('total_with_fgts', 'Total + FGTS'),
+    ('total_percentage_diff', 'Diferença % Total'),
+    ('total_real_diff', 'Diferença Real Total'),
+)
+
+# Columnar file layout: magic, uint32 schema length, JSON schema, then row
+# groups of (uint32 row count, one little-endian array per column) ended by a
+# zero row count. Dates are int32 days since 1970-01-01; missing values are NaN.
+COLUMNAR_MAGIC = b'FCOL1\n'
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+def write_wide_csv(path: str, value_names: List[str], records: Iterable[CompactRecord]) -> int:
+    """Write one row per record with one column per value name"""
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(['ID', 'Data'] + value_names + [header for _, header in SUMMARY_COLUMNS])
+        for record in records:
+            amounts = record.value_amounts()
+            writer.writerow([record['id'], record['date']]
+                            + [amounts.get(name, '') for name in value_names]
+                            + [record[key] for key, _ in SUMMARY_COLUMNS])
+            count += 1
+    return count
+
+def write_columnar(path: str, value_names: List[str], records: Iterable[CompactRecord],
+                   row_group_size: int = 4096) -> int:
+    """Write records as row groups of typed column arrays"""
+    columns = ['date', 'id'] + [key for key, _ in SUMMARY_COLUMNS] + value_names
+    types = ['i', 'q'] + ['d'] * (len(columns) - 2)
+    schema = json.dumps({'columns': columns, 'types': types}).encode('utf-8')
+    
+    count = 0
+    with open(path, 'wb') as file:
+        file.write(COLUMNAR_MAGIC)
+        file.write(struct.pack('<I', len(schema)))
+        file.write(schema)
+        
+        group = [array(type_code) for type_code in types]
+        for record in records:
+            amounts = record.value_amounts()
+            year, month, day = record['date_key'].split('-')
+            group[0].append(date(int(year), int(month), int(day)).toordinal() - EPOCH_ORDINAL)
+            group[1].append(record['id'])
+            for i, (key, _) in enumerate(SUMMARY_COLUMNS, start=2):
+                group[i].append(record[key] or 0.0)
+            for i, name in enumerate(value_names, start=2 + len(SUMMARY_COLUMNS)):
+                group[i].append(amounts.get(name, math.nan))
+            
+            count += 1
+            if len(group[0]) == row_group_size:
+                _write_row_group(file, group)
+                group = [array(type_code) for type_code in types]
+        
+        if len(group[0]):
+            _write_row_group(file, group)
+        file.write(struct.pack('<I', 0))
+    return count
+
+def _write_row_group(file, group: List[array]):
+    """Write one row group in little-endian order"""
+    file.write(struct.pack('<I', len(group[0])))
+    for column in group:
+        if sys.byteorder == 'big':
+            column = array(column.typecode, column)
+            column.byteswap()
+        column.tofile(file)
+
+def read_columnar(path: str) -> Iterator[Dict[str, array]]:
+    """Read a columnar export back, one row group at a time"""
+    with open(path, 'rb') as file:
+        if file.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+            raise ValueError(f"Arquivo não é uma exportação colunar: {path}")
+        schema_length, = struct.unpack('<I', file.read(4))
+        schema = json.loads(file.read(schema_length).decode('utf-8'))
+        
+        while True:
+            row_count, = struct.unpack('<I', file.read(4))
+            if row_count == 0:
+                return
+            group = {}
+            for name, type_code in zip(schema['columns'], schema['types']):
+                column = array(type_code)
+                column.fromfile(file, row_count)
+                if sys.byteorder == 'big':
+                    column.byteswap()
+                group[name] = column
+            yield group
@@ -0,0 +1,30 @@
+"""
+Brazilian number formatting shared by the interface
+"""
+from functools import lru_cache
+
+# Distinct amounts kept formatted; a screen of the table repeats few of them
+CACHE_SIZE = 4096
+
+@lru_cache(maxsize=CACHE_SIZE)
+def format_currency(value: float) -> str:
+    """Format value as Brazilian currency: R$ 1.234,56"""
+    # Grouping with '_' leaves '.' as the only decimal mark, so two swaps suffice.
+    # Adding 0.0 turns -0.0, which shares the cache entry of 0.0, into 0.0: both
+    # format as "R$ 0,00" whichever is cached first (the old formatter kept the sign)
+    return f"R$ {value + 0.0:_.2f}".replace(".", ",").replace("_", ".")
+
+@lru_cache(maxsize=CACHE_SIZE)
+def format_percentage(value: float) -> str:
+    """Format value as percentage: 12.34%"""
+    return f"{value + 0.0:.2f}%"
+
+@lru_cache(maxsize=CACHE_SIZE)
+def format_compact_currency(value: float) -> str:
+    """Format value as Brazilian currency abbreviated for chart axes: R$ 1,5M, R$ 12,3K, R$ 950"""
+    if value >= 1000000:
+        return f"R$ {value / 1000000:.1f}M".replace(".", ",")
+    elif value >= 1000:
+        return f"R$ {value / 1000:.1f}K".replace(".", ",")
+    else:
+        return f"R$ {value + 0.0:.0f}"
@@ -0,0 +1,37 @@
+import csv
+import json
+import os
+from typing import Dict, Iterator
+
+# Columns expected in every history row; fgts may be left empty
+HISTORY_FIELDS = ('date', 'value_name', 'amount', 'fgts')
+
+def read_history_file(path: str) -> Iterator[Dict]:
+    """Stream history rows from a CSV (with header) or JSON-lines file
+    
+    Each row also carries 'line', the line of the file it ends on, for error messages.
+    JSON lines that do not parse or are not objects raise ValueError naming their line.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, newline='', encoding='utf-8') as file:
+        if extension == '.csv':
+            reader = csv.DictReader(file)
+            for row in reader:
+                history_row = {field: (row.get(field) or '').strip() for field in HISTORY_FIELDS}
+                history_row['line'] = reader.line_num
+                yield history_row
+        elif extension in ('.jsonl', '.ndjson', '.json'):
+            for line_number, line in enumerate(file, start=1):
+                if line.strip():
+                    try:
+                        row = json.loads(line)
+                    except json.JSONDecodeError as e:
+                        raise ValueError(f"Linha {line_number}: JSON inválido ({e.msg}, coluna {e.colno})")
+                    if not isinstance(row, dict):
+                        raise ValueError(f"Linha {line_number}: esperado um objeto JSON")
+                    history_row = {field: str(row.get(field) if row.get(field) is not None else '').strip()
+                                   for field in HISTORY_FIELDS}
+                    history_row['line'] = line_number
+                    yield history_row
+        else:
+            raise ValueError(f"Formato de arquivo não suportado: {extension or path}")
@@ -0,0 +1,177 @@
+"""
+Opt-in timing of database calls and interface refreshes
+"""
+import functools
+import inspect
+import json
+import reprlib
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Optional
+from models.financial_record import CompactRecord
+
+class Instrumentation:
+    """Collect timing spans, row counts and call counts of wrapped methods
+    
+    Nothing is measured until methods are wrapped with wrap() or
+    instrument_database(), so the app pays nothing while instrumentation is
+    off. Spans started while another one runs on the same thread record it as
+    their parent, which separates e.g. the SQLite part of get_records from
+    the records it builds.
+    
+    A call is redundant when the same method runs again with the same
+    arguments within REDUNDANT_WINDOW seconds and nothing was written in
+    between (the state function given to wrap() returned the same value).
+    """
+    
+    # Seconds within which a repeated identical call counts as redundant
+    REDUNDANT_WINDOW = 2.0
+    
+    # Latest spans and redundant calls kept for the JSON log
+    RECENT_SPANS = 500
+    RECENT_REDUNDANT_CALLS = 100
+    
+    # DatabaseManager methods that are setup or plumbing rather than operations
+    UNTIMED_DATABASE_METHODS = ('init_database', 'migrate_schema', 'get_connection', 'transaction', 'close')
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.started = time.perf_counter()
+        self.reset()
+    
+    def reset(self):
+        """Forget everything measured so far"""
+        with self._lock:
+            self._stats = {}
+            self._last_calls = {}
+            self._recent = deque(maxlen=self.RECENT_SPANS)
+            self._redundant = deque(maxlen=self.RECENT_REDUNDANT_CALLS)
+    
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+    
+    @contextmanager
+    def span(self, name: str, call_key: Optional[str] = None, state: Optional[Callable] = None):
+        """Time the block under name; the yielded dict's 'rows' may be set by the block
+        
+        Only spans given a call_key take part in redundant call detection.
+        """
+        stack = self._stack()
+        entry = {'name': name, 'rows': None}
+        parent = stack[-1]['name'] if stack else None
+        state_value = state() if state is not None else None
+        stack.append(entry)
+        start = time.perf_counter()
+        try:
+            yield entry
+        finally:
+            seconds = time.perf_counter() - start
+            # Removed by identity: a suspended generator's span may not be on top
+            stack[:] = [item for item in stack if item is not entry]
+            self._record(name, start, seconds, entry['rows'], parent, call_key, state_value)
+    
+    def _record(self, name, start, seconds, rows, parent, call_key, state_value):
+        with self._lock:
+            stats = self._stats.setdefault(name, {'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0,
+                                                  'rows': 0, 'redundant_calls': 0})
+            stats['calls'] += 1
+            stats['seconds'] += seconds
+            stats['max_seconds'] = max(stats['max_seconds'], seconds)
+            stats['rows'] += rows or 0
+            
+            if call_key is not None:
+                previous = self._last_calls.get((name, call_key))
+                if (previous is not None and start - previous[0] <= self.REDUNDANT_WINDOW
+                        and previous[1] == state_value):
+                    stats['redundant_calls'] += 1
+                    self._redundant.append({'name': name, 'arguments': call_key,
+                                            'seconds_since_previous': start - previous[0],
+                                            'at': start - self.started})
+                self._last_calls[(name, call_key)] = (start, state_value)
+            
+            self._recent.append({'name': name, 'parent': parent, 'at': start - self.started,
+                                 'seconds': seconds, 'rows': rows,
+                                 'thread': threading.current_thread().name})
+    
+    @staticmethod
+    def count_rows(result) -> Optional[int]:
+        """Rows in a method result: list length, column length, or 1 for a single record"""
+        if result is None:
+            return 0
+        if isinstance(result, (list, tuple)):
+            return len(result)
+        if isinstance(result, CompactRecord):
+            return 1
+        if isinstance(result, dict):
+            columns = list(result.values())
+            if columns and all(isinstance(column, tuple) for column in columns):
+                return len(columns[0])
+            return 1
+        return None
+    
+    @staticmethod
+    def _call_key(args, kwargs) -> str:
+        # Abbreviated, so large arguments (whole dashboards) stay cheap to compare
+        return reprlib.repr(args + tuple(sorted(kwargs.items())))
+    
+    def wrap(self, obj, names: Iterable[str], prefix: str, state: Optional[Callable] = None):
+        """Replace methods of obj with timed versions, named prefix.method
+        
+        The wrappers are set on the instance, so calls made through self
+        inside the object are timed too.
+        """
+        for name in names:
+            setattr(obj, name, self._timed(getattr(obj, name), f"{prefix}.{name}", state))
+    
+    def _timed(self, method, name, state):
+        if inspect.isgeneratorfunction(method):
+            @functools.wraps(method)
+            def timed_generator(*args, **kwargs):
+                # The span lasts until the generator is exhausted and counts what it yields
+                with self.span(name, self._call_key(args, kwargs), state) as entry:
+                    entry['rows'] = 0
+                    for item in method(*args, **kwargs):
+                        entry['rows'] += 1
+                        yield item
+            return timed_generator
+        
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            with self.span(name, self._call_key(args, kwargs), state) as entry:
+                result = method(*args, **kwargs)
+                entry['rows'] = self.count_rows(result)
+                return result
+        return timed
+    
+    def instrument_database(self, db_manager):
+        """Time every public method of a DatabaseManager, and the parts it reports through span()"""
+        names = [name for name, value in vars(type(db_manager)).items()
+                 if inspect.isfunction(value) and not name.startswith('_')
+                 and name not in self.UNTIMED_DATABASE_METHODS]
+        self.wrap(db_manager, names, type(db_manager).__name__, state=lambda: db_manager.generation)
+        db_manager.instrumentation = self
+    
+    def snapshot(self) -> Dict:
+        """Statistics per operation, slowest total first, with the latest spans and redundant calls"""
+        with self._lock:
+            operations = {
+                name: dict(stats, mean_seconds=stats['seconds'] / stats['calls'])
+                for name, stats in sorted(self._stats.items(), key=lambda item: item[1]['seconds'], reverse=True)
+            }
+            return {
+                'uptime_seconds': time.perf_counter() - self.started,
+                'operations': operations,
+                'redundant_calls': list(self._redundant),
+                'recent_spans': list(self._recent),
+            }
+    
+    def dump(self, path: str):
+        """Write the snapshot to a JSON log"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, indent=2, ensure_ascii=False)